@@ -0,0 +1,32 @@
+"""add books keyset indexes
+
+Revision ID: 3b7f0c2a9d41
+Revises: 821d49dd88de
+Create Date: 2026-10-18 10:12:40.118532
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3b7f0c2a9d41'
+down_revision: Union[str, Sequence[str], None] = '821d49dd88de'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_books_price_id', 'books', ['price', 'id'], unique=False)
+    op.create_index('ix_books_title_id', 'books', ['title', 'id'], unique=False)
+    op.create_index('ix_books_created_at_id', 'books', ['created_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_books_created_at_id', table_name='books')
+    op.drop_index('ix_books_title_id', table_name='books')
+    op.drop_index('ix_books_price_id', table_name='books')
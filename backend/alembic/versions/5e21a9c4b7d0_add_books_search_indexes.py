@@ -0,0 +1,74 @@
+"""add books search indexes
+
+Revision ID: 5e21a9c4b7d0
+Revises: 3b7f0c2a9d41
+Create Date: 2026-10-18 11:03:27.540913
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5e21a9c4b7d0'
+down_revision: Union[str, Sequence[str], None] = '3b7f0c2a9d41'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    dialect = op.get_bind().dialect.name
+
+    if dialect == 'postgresql':
+        # trigram indexes make the existing ILIKE '%x%' filters index scans
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        for column in ('title', 'author', 'domain'):
+            op.execute(f"CREATE INDEX ix_books_{column}_trgm ON books USING gin ({column} gin_trgm_ops)")
+
+        # ranked full-text search, see services/search.py SEARCH_VECTOR. The document is a
+        # stored column so ranking reads it instead of running to_tsvector for every match
+        op.execute("""
+            ALTER TABLE books ADD COLUMN search_tsv tsvector GENERATED ALWAYS AS (
+                to_tsvector('simple', coalesce(title, '') || ' ' || coalesce(author, '') || ' ' || coalesce(domain, ''))
+            ) STORED
+        """)
+        op.execute("CREATE INDEX ix_books_search_tsv ON books USING gin (search_tsv)")
+
+    elif dialect == 'sqlite':
+        op.execute("CREATE VIRTUAL TABLE books_fts USING fts5(title, author, domain, content='books', content_rowid='id')")
+        op.execute("""
+            CREATE TRIGGER books_fts_insert AFTER INSERT ON books BEGIN
+                INSERT INTO books_fts(rowid, title, author, domain) VALUES (new.id, new.title, new.author, new.domain);
+            END
+        """)
+        op.execute("""
+            CREATE TRIGGER books_fts_delete AFTER DELETE ON books BEGIN
+                INSERT INTO books_fts(books_fts, rowid, title, author, domain) VALUES ('delete', old.id, old.title, old.author, old.domain);
+            END
+        """)
+        op.execute("""
+            CREATE TRIGGER books_fts_update AFTER UPDATE OF title, author, domain ON books BEGIN
+                INSERT INTO books_fts(books_fts, rowid, title, author, domain) VALUES ('delete', old.id, old.title, old.author, old.domain);
+                INSERT INTO books_fts(rowid, title, author, domain) VALUES (new.id, new.title, new.author, new.domain);
+            END
+        """)
+        op.execute("INSERT INTO books_fts(books_fts) VALUES ('rebuild')")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    dialect = op.get_bind().dialect.name
+
+    if dialect == 'postgresql':
+        op.execute("DROP INDEX IF EXISTS ix_books_search_tsv")
+        op.execute("ALTER TABLE books DROP COLUMN IF EXISTS search_tsv")
+        for column in ('title', 'author', 'domain'):
+            op.execute(f"DROP INDEX IF EXISTS ix_books_{column}_trgm")
+
+    elif dialect == 'sqlite':
+        for trigger in ('books_fts_insert', 'books_fts_delete', 'books_fts_update'):
+            op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        op.execute("DROP TABLE IF EXISTS books_fts")
@@ -0,0 +1,47 @@
+"""historical sales daily key
+
+Revision ID: 9c3d5e7f1a20
+Revises: 5e21a9c4b7d0
+Create Date: 2026-10-18 13:21:09.664120
+
+The upgrade folds duplicate (domain, sale_date) rows into one daily total and
+deletes the rest. That is one-way: downgrade only drops the unique key, it can't
+split the totals back into the original rows. Back up historical_sales first if
+the individual rows matter.
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9c3d5e7f1a20'
+down_revision: Union[str, Sequence[str], None] = '5e21a9c4b7d0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # fold existing rows into one daily total per (domain, sale_date) before adding the key
+    op.execute("""
+        UPDATE historical_sales SET quantity = totals.quantity
+        FROM (SELECT MIN(id) AS id, SUM(quantity) AS quantity FROM historical_sales GROUP BY domain, sale_date) AS totals
+        WHERE historical_sales.id = totals.id
+    """)
+    op.execute("""
+        DELETE FROM historical_sales
+        WHERE id NOT IN (SELECT MIN(id) FROM historical_sales GROUP BY domain, sale_date)
+    """)
+    # sqlite can't ALTER TABLE ADD CONSTRAINT, batch mode recreates the table there
+    with op.batch_alter_table('historical_sales') as batch_op:
+        batch_op.create_unique_constraint('uq_historical_sales_domain_sale_date', ['domain', 'sale_date'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # the rows folded by upgrade() stay folded, one total per (domain, sale_date)
+    with op.batch_alter_table('historical_sales') as batch_op:
+        batch_op.drop_constraint('uq_historical_sales_domain_sale_date', type_='unique')
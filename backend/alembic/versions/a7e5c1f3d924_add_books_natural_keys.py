@@ -0,0 +1,41 @@
+"""add books natural keys
+
+Revision ID: a7e5c1f3d924
+Revises: f3b9d2c6a870
+Create Date: 2026-10-18 16:48:12.604117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7e5c1f3d924'
+down_revision: Union[str, Sequence[str], None] = 'f3b9d2c6a870'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('books', sa.Column('sku', sa.String(), nullable=True))
+
+    # duplicate titles may already have orders and sales pointing at them, so they
+    # are not merged here; list them and let an admin decide
+    duplicates = op.get_bind().execute(sa.text(
+        "SELECT title, author, COUNT(*) FROM books GROUP BY title, author HAVING COUNT(*) > 1"
+    )).fetchall()
+    if duplicates:
+        raise RuntimeError(f"books has duplicate (title, author) rows, merge them before upgrading: {duplicates[:20]}")
+
+    op.create_index('ux_books_title_author', 'books', ['title', 'author'], unique=True)
+    op.create_index('ux_books_sku', 'books', ['sku'], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ux_books_sku', table_name='books')
+    op.drop_index('ux_books_title_author', table_name='books')
+    op.drop_column('books', 'sku')
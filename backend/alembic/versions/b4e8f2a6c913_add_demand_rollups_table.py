@@ -0,0 +1,40 @@
+"""add demand rollups table
+
+Revision ID: b4e8f2a6c913
+Revises: 9c3d5e7f1a20
+Create Date: 2026-10-18 14:02:51.207384
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b4e8f2a6c913'
+down_revision: Union[str, Sequence[str], None] = '9c3d5e7f1a20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('demand_rollups',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('grain', sa.String(), nullable=False),
+    sa.Column('period_start', sa.Date(), nullable=False),
+    sa.Column('domain', sa.String(), nullable=False),
+    sa.Column('book_id', sa.Integer(), nullable=False),
+    sa.Column('quantity', sa.Integer(), nullable=False),
+    sa.Column('revenue', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('grain', 'domain', 'book_id', 'period_start', name='uq_demand_rollups_key')
+    )
+    op.create_index(op.f('ix_demand_rollups_id'), 'demand_rollups', ['id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_demand_rollups_id'), table_name='demand_rollups')
+    op.drop_table('demand_rollups')
@@ -0,0 +1,32 @@
+"""add order events txid
+
+Revision ID: b6f1d8a3e259
+Revises: e2f6b8d4c1a3
+Create Date: 2026-10-20 11:05:52.770431
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b6f1d8a3e259'
+down_revision: Union[str, Sequence[str], None] = 'e2f6b8d4c1a3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # existing events read as txid 0, i.e. in seq order ahead of every new one
+    op.add_column('order_events', sa.Column('txid', sa.BigInteger(), server_default='0', nullable=False))
+    op.create_index('ix_order_events_txid_seq', 'order_events', ['txid', 'seq'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_order_events_txid_seq', table_name='order_events')
+    with op.batch_alter_table('order_events') as batch_op:
+        batch_op.drop_column('txid')
@@ -0,0 +1,38 @@
+"""add stock shards
+
+Revision ID: c5d8a2e4f617
+Revises: a7e5c1f3d924
+Create Date: 2026-10-18 17:31:05.482931
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c5d8a2e4f617'
+down_revision: Union[str, Sequence[str], None] = 'a7e5c1f3d924'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('books', sa.Column('stock_shards', sa.Integer(), server_default='0', nullable=False))
+    op.create_table('stock_shards',
+    sa.Column('book_id', sa.Integer(), nullable=False),
+    sa.Column('shard', sa.Integer(), nullable=False),
+    sa.Column('quantity', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['book_id'], ['books.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('book_id', 'shard')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # fold any sharded stock back into books before the shards go away
+    op.execute("UPDATE books SET stock_quantity = (SELECT COALESCE(SUM(quantity), 0) FROM stock_shards WHERE stock_shards.book_id = books.id) WHERE stock_shards > 0")
+    op.drop_table('stock_shards')
+    op.drop_column('books', 'stock_shards')
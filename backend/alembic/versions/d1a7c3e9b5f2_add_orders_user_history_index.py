@@ -0,0 +1,28 @@
+"""add orders user history index
+
+Revision ID: d1a7c3e9b5f2
+Revises: b4e8f2a6c913
+Create Date: 2026-10-18 15:10:33.871205
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd1a7c3e9b5f2'
+down_revision: Union[str, Sequence[str], None] = 'b4e8f2a6c913'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_orders_user_id_created_at', 'orders', ['user_id', sa.text('created_at DESC'), sa.text('id DESC')], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_orders_user_id_created_at', table_name='orders')
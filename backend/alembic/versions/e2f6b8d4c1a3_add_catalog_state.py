@@ -0,0 +1,40 @@
+"""add catalog state
+
+Revision ID: e2f6b8d4c1a3
+Revises: c5d8a2e4f617
+Create Date: 2026-10-18 18:20:44.915372
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e2f6b8d4c1a3'
+down_revision: Union[str, Sequence[str], None] = 'c5d8a2e4f617'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # no server default: sqlite can't add a column defaulting to now(), and the
+    # application sets the value on insert and on every admin edit
+    op.add_column('books', sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True))
+    op.execute("UPDATE books SET updated_at = created_at")
+
+    op.create_table('catalog_state',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('version', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('changed_at', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.execute("INSERT INTO catalog_state (id) VALUES (1)")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('catalog_state')
+    op.drop_column('books', 'updated_at')
@@ -1,9 +1,15 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
 from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from typing import Annotated
 from fastapi import Depends
 from dotenv import load_dotenv
 import os
+import threading
+import time
+import warnings
 
 # Load environment variables from .env
 load_dotenv()
@@ -14,7 +20,119 @@ if not SQLALCHEMY_DATABASE_URL:
     raise RuntimeError("DATABASE_URL is not set in the environment")
 
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+class PoolMetrics:
+    """Checkout wait times of a connection pool, read by pool_stats()."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def record(self, waited: float, timed_out: bool = False):
+        with self._lock:
+            if timed_out:
+                # waited the full pool_timeout, counted apart so it doesn't skew the averages
+                self.timeouts += 1
+                return
+            self.checkouts += 1
+            self.total_wait += waited
+            self.max_wait = max(self.max_wait, waited)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                'checkouts': self.checkouts,
+                'checkout_timeouts': self.timeouts,
+                'avg_wait_ms': round(self.total_wait / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+                'max_wait_ms': round(self.max_wait * 1000, 3),
+            }
+
+
+# a connection opened for the checkout in progress is flagged until that checkout
+# completes, so a reconnect of a recycled connection doesn't mark its next checkout
+def flag_new_connection(dbapi_connection, connection_record):
+    connection_record.info['new_connection'] = True
+
+
+def clear_new_connection(dbapi_connection, connection_record, connection_proxy):
+    connection_record.info.pop('new_connection', None)
+
+
+class TimedPoolMixin:
+    """Times how long each checkout waits for a free connection.
+
+    QueuePool only opens a new connection when it is under pool_size + max_overflow,
+    without waiting, so such a checkout counts as no wait and its connect time,
+    a network round trip rather than pool contention, is left out.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics = PoolMetrics()
+        # a recreated pool inherits the listeners of the one it replaces
+        if flag_new_connection not in self.dispatch.connect:
+            event.listen(self, "connect", flag_new_connection)
+            event.listen(self, "checkout", clear_new_connection)
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            record = super()._do_get()
+        except exc.TimeoutError:
+            self.metrics.record(time.perf_counter() - start, timed_out = True)
+            raise
+        self.metrics.record(0.0 if record.info.get('new_connection') else time.perf_counter() - start)
+        return record
+
+
+class TimedQueuePool(TimedPoolMixin, QueuePool):
+    pass
+
+
+class TimedAsyncQueuePool(TimedPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def env_bool(name: str, default: bool) -> bool:
+    return os.getenv(name, str(default)).strip().lower() in ("1", "true", "yes", "on")
+
+
+# statement timeout applied to every connection (postgres only), 0 disables it
+STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "0"))
+
+
+def engine_options(url: str, is_async: bool = False) -> dict:
+    """Pool settings from the environment: DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT,
+    DB_POOL_RECYCLE, DB_POOL_PRE_PING and DB_STATEMENT_TIMEOUT_MS."""
+    backend = make_url(url).get_backend_name()
+    options = {
+        'pool_pre_ping': env_bool("DB_POOL_PRE_PING", True),
+        'pool_recycle': int(os.getenv("DB_POOL_RECYCLE", "1800")),
+    }
+
+    # in-memory sqlite uses a singleton pool that can't be sized
+    if backend != "sqlite" or make_url(url).database not in (None, "", ":memory:"):
+        options.update({
+            'poolclass': TimedAsyncQueuePool if is_async else TimedQueuePool,
+            'pool_size': int(os.getenv("DB_POOL_SIZE", "5")),
+            'max_overflow': int(os.getenv("DB_MAX_OVERFLOW", "10")),
+            'pool_timeout': float(os.getenv("DB_POOL_TIMEOUT", "30")),
+        })
+
+    if backend == "postgresql" and STATEMENT_TIMEOUT_MS > 0:
+        if is_async:
+            options['connect_args'] = {'server_settings': {'statement_timeout': str(STATEMENT_TIMEOUT_MS)}}
+        else:
+            options['connect_args'] = {'options': f"-c statement_timeout={STATEMENT_TIMEOUT_MS}"}
+
+    return options
+
+
+ENGINE_OPTIONS = engine_options(SQLALCHEMY_DATABASE_URL)
+
+engine = create_engine(SQLALCHEMY_DATABASE_URL, **ENGINE_OPTIONS)
 
 Session_local = sessionmaker(autoflush=False, autocommit=False, bind=engine)
 
@@ -25,4 +143,69 @@ def get_db():
     finally:
         db.close()
 
-db_dependency = Annotated[Session, Depends(get_db)]
\ No newline at end of file
+db_dependency = Annotated[Session, Depends(get_db)]
+
+
+# async drivers for the same database, used by the async def routes
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+def async_database_url(url: str) -> str | None:
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        return None
+    return parsed.set(drivername = ASYNC_DRIVERS[backend]).render_as_string(hide_password = False)
+
+
+ASYNC_SQLALCHEMY_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or async_database_url(SQLALCHEMY_DATABASE_URL)
+
+# without an async driver the sync engine, the sync routes and the scripts keep working;
+# only the async def routes fail, with the reason below
+async_engine = None
+ASYNC_ENGINE_OPTIONS = {}
+ASYNC_UNAVAILABLE = None
+if ASYNC_SQLALCHEMY_DATABASE_URL is None:
+    ASYNC_UNAVAILABLE = f"No async driver configured for {make_url(SQLALCHEMY_DATABASE_URL).get_backend_name()}, set ASYNC_DATABASE_URL"
+else:
+    try:
+        ASYNC_ENGINE_OPTIONS = engine_options(ASYNC_SQLALCHEMY_DATABASE_URL, is_async = True)
+        async_engine = create_async_engine(ASYNC_SQLALCHEMY_DATABASE_URL, **ASYNC_ENGINE_OPTIONS)
+    except ImportError as e:
+        ASYNC_UNAVAILABLE = f"Async driver for {make_url(ASYNC_SQLALCHEMY_DATABASE_URL).drivername} is not installed ({e})"
+if ASYNC_UNAVAILABLE:
+    warnings.warn(f"{ASYNC_UNAVAILABLE}; async database routes are disabled")
+
+AsyncSession_local = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
+async def get_async_db():
+    if async_engine is None:
+        raise RuntimeError(ASYNC_UNAVAILABLE)
+    async with AsyncSession_local() as db:
+        yield db
+
+async_db_dependency = Annotated[AsyncSession, Depends(get_async_db)]
+
+
+
+def describe_pool(pool, options: dict) -> dict:
+    stats = {'pool': type(pool).__name__, 'status': pool.status()}
+    if isinstance(pool, QueuePool):
+        stats.update({
+            'size': pool.size(),
+            'checked_in': pool.checkedin(),
+            'checked_out': pool.checkedout(),
+            'overflow': max(pool.overflow(), 0),
+            'max_overflow': options.get('max_overflow'),
+        })
+    if isinstance(pool, TimedPoolMixin):
+        stats.update(pool.metrics.snapshot())
+    return stats
+
+
+def pool_stats() -> dict:
+    return {'sync': describe_pool(engine.pool, ENGINE_OPTIONS),
+            'async': describe_pool(async_engine.sync_engine.pool, ASYNC_ENGINE_OPTIONS) if async_engine else {'unavailable': ASYNC_UNAVAILABLE}}
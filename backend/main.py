@@ -1,9 +1,21 @@
 from fastapi import FastAPI
+from contextlib import asynccontextmanager
+import os
 import models
 from database import engine
 from routers import books, auth, admin, orders
+from services.ai_search import preload_provider
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # the AI stack is otherwise loaded by the first /public/ai-search call
+    if os.getenv("AI_SEARCH_PRELOAD", "0") == "1":
+        preload_provider()
+    yield
+
+
+app = FastAPI(lifespan=lifespan)
 
 @app.get('/')
 def health_check():
@@ -12,4 +24,4 @@ def health_check():
 app.include_router(books.router)
 app.include_router(auth.router)
 app.include_router(admin.router)
-app.include_router(orders.router)
\ No newline at end of file
+app.include_router(orders.router)
@@ -1,10 +1,14 @@
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, DateTime, func, Date
-from datetime import datetime
+from sqlalchemy import Column, Integer, BigInteger, String, Boolean, ForeignKey, DateTime, func, Date, Index, UniqueConstraint
+from datetime import datetime, timezone
 
 Base = declarative_base()
 
 
+def utc_now():
+    return datetime.now(timezone.utc)
+
+
 class Users(Base):
     __tablename__ = 'users'
 
@@ -27,7 +31,45 @@ class Books(Base):
     domain = Column(String)
     price = Column(Integer, nullable = False)
     stock_quantity = Column(Integer, nullable = False)
+    sku = Column(String)
+    # 0: stock lives in stock_quantity; N: split across N stock_shards rows and
+    # stock_quantity is their periodically refreshed total
+    stock_shards = Column(Integer, nullable = False, default = 0, server_default = '0')
     created_at = Column(DateTime(timezone = True), server_default = func.now(), nullable = False)
+    # last admin edit of the row, set by the admin writes themselves: order stock
+    # changes leave it alone so the hot row of a popular book isn't rewritten twice.
+    # set by the application rather than now() so sqlite keeps sub-second precision too
+    updated_at = Column(DateTime(timezone = True), default = utc_now)
+
+    # (sort key, id) indexes backing keyset pagination of the catalog
+    __table_args__ = (
+        Index('ix_books_price_id', 'price', 'id'),
+        Index('ix_books_title_id', 'title', 'id'),
+        Index('ix_books_created_at_id', 'created_at', 'id'),
+        # natural keys bulk imports upsert on
+        Index('ux_books_title_author', 'title', 'author', unique = True),
+        Index('ux_books_sku', 'sku', unique = True),
+    )
+
+
+
+class CatalogState(Base):
+    __tablename__ = 'catalog_state'
+
+    # single row; version is bumped by every admin write to books, in its transaction,
+    # and keys the catalog validators and cached totals of every process
+    id = Column(Integer, primary_key = True)
+    version = Column(Integer, nullable = False, default = 0, server_default = '0')
+    changed_at = Column(DateTime(timezone = True))
+
+
+
+class StockShard(Base):
+    __tablename__ = 'stock_shards'
+
+    book_id = Column(Integer, ForeignKey("books.id", ondelete = "CASCADE"), primary_key = True)
+    shard = Column(Integer, primary_key = True)
+    quantity = Column(Integer, nullable = False)
 
 
 
@@ -42,6 +84,33 @@ class Orders(Base):
     status = Column(String, nullable = False, default = "PLACED")
     created_at = Column(DateTime(timezone = True), server_default = func.now(), nullable = False)
 
+    # customer order history, newest first
+    __table_args__ = (
+        Index('ix_orders_user_id_created_at', user_id, created_at.desc(), id.desc()),
+    )
+
+
+class OrderEvent(Base):
+    __tablename__ = 'order_events'
+
+    # append-only: consumers read in (txid, seq) order and resume from the last seq they read
+    seq = Column(Integer, primary_key = True, autoincrement = True)
+    order_id = Column(Integer, ForeignKey("orders.id"), nullable = False, index = True)
+    event_type = Column(String, nullable = False)
+    from_status = Column(String)
+    to_status = Column(String, nullable = False)
+    user_id = Column(Integer, nullable = False)
+    book_id = Column(Integer, nullable = False)
+    quantity = Column(Integer, nullable = False)
+    actor_id = Column(Integer)
+    # writing transaction's id on postgres, 0 elsewhere
+    txid = Column(BigInteger, nullable = False, default = 0, server_default = '0')
+    created_at = Column(DateTime(timezone = True), server_default = func.now(), nullable = False)
+
+    __table_args__ = (
+        Index('ix_order_events_txid_seq', 'txid', 'seq'),
+    )
+
 
 class Sales(Base):
     __tablename__ = 'sales'
@@ -62,3 +131,25 @@ class HistoricalSales(Base):
     domain = Column(String, nullable = False)
     quantity = Column(Integer, nullable = False)
     sale_date = Column(Date, nullable = False)
+
+    # one daily total per domain, the key incremental loads upsert on
+    __table_args__ = (
+        UniqueConstraint('domain', 'sale_date', name = 'uq_historical_sales_domain_sale_date'),
+    )
+
+
+
+class DemandRollup(Base):
+    __tablename__ = "demand_rollups"
+
+    id = Column(Integer, primary_key = True, index = True)
+    grain = Column(String, nullable = False)  # 'day' or 'week' (ISO week, starting monday)
+    period_start = Column(Date, nullable = False)
+    domain = Column(String, nullable = False)
+    book_id = Column(Integer, nullable = False, default = 0)  # 0 = every book of the domain
+    quantity = Column(Integer, nullable = False, default = 0)
+    revenue = Column(Integer, nullable = False, default = 0)
+
+    __table_args__ = (
+        UniqueConstraint('grain', 'domain', 'book_id', 'period_start', name = 'uq_demand_rollups_key'),
+    )
@@ -1,13 +1,32 @@
-from fastapi import APIRouter, HTTPException, Depends, Path, Query, Body
+from fastapi import APIRouter, HTTPException, Depends, Path, Query, Body, Request
 from starlette import status
 from pydantic import BaseModel, Field
 from typing import Annotated, Optional
 from database import Session_local, engine
-from models import Books, Users, Orders, Sales
-from schemas.book import Book, updateBook
-from routers.auth import get_current_user, user_dependency
-from database import db_dependency
+from models import Books, Orders, Sales, StockShard, utc_now
+from schemas.book import Book, updateBook, BookResponse
+from schemas.order import OrderPage, OrderEventPage
+from routers.auth import get_current_user, user_dependency, verified_user_dependency, principal_cache
+from database import db_dependency, async_db_dependency, pool_stats, AsyncSession_local
+from fastapi.responses import StreamingResponse
+import csv
+import io
+import json
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
 from datetime import datetime, timezone
+from services.catalog import invalidate_catalog, invalidate_book, cache_stats, bump_catalog_version
+from services.ai_search import ai_search_stats
+from services.inventory import enable_shards, rebalance_shards, collapse_shards, shard_release_statement, stock_release_statement, mark_stock_dirty, MAX_SHARDS
+from services.catalog_import import RowParser, upsert_batch, empty_report, stream_lines
+from services.order_events import order_event, append_event_statements, events_query, STATUS_CHANGED
+from services.pagination import apply_keyset, next_page
+from services.rollup import sale_rollup_statement, sales_rollup_statement, demand_query, latest_period_query
+from sqlalchemy import insert
+from collections import defaultdict
+from fastapi.concurrency import run_in_threadpool
+from datetime import date
+from typing import Literal
 
 
 router = APIRouter(
@@ -19,16 +38,42 @@ class UpdateOrderStatus(BaseModel):
     status: str
 
 
-@router.post('/', status_code=status.HTTP_201_CREATED)
-def add_book(new_book : Book, db: db_dependency, user: user_dependency):
-    db_user = db.query(Users).filter(Users.id == user["id"]).first()
+class BulkUpdateOrderStatus(BaseModel):
+    order_ids: list[int] = Field(..., min_length=1, max_length=1000, description="Orders to move to the new status.")
+    status: str
+
+
+valid_statuses = ['PLACED', 'CANCELLED', 'CONFIRMED', 'SHIPPED', 'DELIVERED']
+
+allowed_transitions = {
+    "PLACED": {"CONFIRMED", "CANCELLED"},
+    "CONFIRMED":{"SHIPPED", "CANCELLED"},
+    "SHIPPED": {"DELIVERED"},
+    "CANCELLED": set(),
+    "DELIVERED": set()
+}
+
+
+def flush_book_changes(db):
+    """Write pending book changes, turning a unique title/author or sku clash into a 409."""
+    try:
+        db.flush()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code = status.HTTP_409_CONFLICT, detail = "A book with this title and author or sku already exists.")
+
 
-    if db_user.role != "admin":
+@router.post('/', status_code=status.HTTP_201_CREATED, response_model=BookResponse)
+def add_book(new_book : Book, db: db_dependency, user: verified_user_dependency):
+    if user["role"] != "admin":
         raise HTTPException(status_code=status.HTTP_203_NON_AUTHORITATIVE_INFORMATION, detail = "Admin privilages are required")
     
     book_model = Books(**new_book.model_dump())
     db.add(book_model)
+    flush_book_changes(db)
+    bump_catalog_version(db)
     db.commit()
+    invalidate_catalog()
     db.refresh(book_model)
 
     return book_model
@@ -36,11 +81,34 @@ def add_book(new_book : Book, db: db_dependency, user: user_dependency):
 
 
 
-@router.put('/{book_id}', status_code = status.HTTP_200_OK)
-def update_book(user: user_dependency, db: db_dependency, updated_book : Book, book_id: int):
-    db_user = db.query(Users).filter(Users.id == user["id"]).first()
+@router.post('/books/import', status_code=status.HTTP_200_OK)
+async def import_books(user: verified_user_dependency, db: db_dependency, request: Request,
+                       import_format: Literal["csv", "ndjson"] = Query(default="csv", alias="format"),
+                       key: Literal["title_author", "sku"] = Query(default="title_author", description="Natural key existing books are matched on."),
+                       batch_size: int = Query(default=1000, ge=1, le=5000)):
+    if user["role"] != "admin":
+        raise HTTPException(status_code=status.HTTP_203_NON_AUTHORITATIVE_INFORMATION, detail = "Admin privilages are required")
+
+    # the body is read line by line and upserted a batch at a time, each batch committed
+    parser = RowParser(import_format)
+    report = empty_report()
+    batch = []
+    async for line in stream_lines(request.stream()):
+        batch.extend(parser.feed(line))
+        if len(batch) >= batch_size:
+            await run_in_threadpool(upsert_batch, db, batch, key, report)
+            batch = []
+    batch.extend(parser.close())
+    if batch:
+        await run_in_threadpool(upsert_batch, db, batch, key, report)
+
+    return report
+
+
 
-    if db_user.role != "admin":
+@router.put('/{book_id}', status_code = status.HTTP_200_OK)
+def update_book(user: verified_user_dependency, db: db_dependency, updated_book : Book, book_id: int):
+    if user["role"] != "admin":
         raise HTTPException(status_code=status.HTTP_203_NON_AUTHORITATIVE_INFORMATION, detail = "Admin privilages are required")
 
     book_model = db.query(Books).filter(Books.id == book_id).first()
@@ -52,15 +120,20 @@ def update_book(user: user_dependency, db: db_dependency, updated_book : Book, b
     book_model.domain = updated_book.domain
     book_model.price = updated_book.price
     book_model.stock_quantity = updated_book.stock_quantity
+    book_model.sku = updated_book.sku
+    book_model.updated_at = utc_now()
+    flush_book_changes(db)
+    if book_model.stock_shards:
+        rebalance_shards(db, book_id, updated_book.stock_quantity)
+    bump_catalog_version(db)
     db.commit()
+    invalidate_catalog(book_id)
         
         
 
-@router.patch("/{book_id}", status_code = status.HTTP_200_OK)
-def patch_book(user: user_dependency, db: db_dependency, book_id: int, updated_book: updateBook):
-    db_user = db.query(Users).filter(Users.id == user["id"]).first()
-
-    if db_user.role != "admin":
+@router.patch("/{book_id}", status_code = status.HTTP_200_OK, response_model = BookResponse)
+def patch_book(user: verified_user_dependency, db: db_dependency, book_id: int, updated_book: updateBook):
+    if user["role"] != "admin":
         raise HTTPException(status_code = status.HTTP_203_NON_AUTHORITATIVE_INFORMATION, detail = "Admin privilages are required")
 
     book_model = db.query(Books).filter(Books.id == book_id).first()
@@ -71,16 +144,22 @@ def patch_book(user: user_dependency, db: db_dependency, book_id: int, updated_b
 
     for field, value in update_data.items():
         setattr(book_model, field, value)
+    book_model.updated_at = utc_now()
+    flush_book_changes(db)
+    if book_model.stock_shards and 'stock_quantity' in update_data:
+        rebalance_shards(db, book_id, update_data['stock_quantity'])
 
+    bump_catalog_version(db)
     db.commit()
+    invalidate_catalog(book_id)
     db.refresh(book_model)
     return book_model
 
 
 
 @router.delete('/{book_id}', status_code = status.HTTP_204_NO_CONTENT)
-def delete_book(user: user_dependency, db: db_dependency, book_id: int):
-    if user.get('role') != 'admin' and not user:
+def delete_book(user: verified_user_dependency, db: db_dependency, book_id: int):
+    if user.get('role') != 'admin':
         raise HTTPException(status_code = status.HTTP_401_UNAUTHORIZED, detail="Authentication failed.")
 
     book_model = db.query(Books).filter(Books.id == book_id).first()
@@ -88,41 +167,289 @@ def delete_book(user: user_dependency, db: db_dependency, book_id: int):
         raise HTTPException(status_code = status.HTTP_404_NOT_FOUND, detail="Book not found.")
     
     db.delete(book_model)
+    bump_catalog_version(db)
+    db.commit()
+    invalidate_catalog(book_id)
+
+
+
+@router.get('/{book_id}/shards', status_code=status.HTTP_200_OK)
+def get_stock_shards(user: verified_user_dependency, db: db_dependency, book_id: int):
+    if user["role"] != "admin":
+        raise HTTPException(status_code=status.HTTP_203_NON_AUTHORITATIVE_INFORMATION, detail = "Admin privilages are required")
+
+    book_model = db.query(Books).filter(Books.id == book_id).first()
+    if not book_model:
+        raise HTTPException(status_code = status.HTTP_404_NOT_FOUND, detail="Book not found.")
+
+    shards = db.query(StockShard).filter(StockShard.book_id == book_id).order_by(StockShard.shard).all()
+    return {'book_id': book_id,
+            'stock_shards': book_model.stock_shards,
+            'stock_quantity': book_model.stock_quantity,
+            'shard_total': sum(shard.quantity for shard in shards),
+            'shards': [{'shard': shard.shard, 'quantity': shard.quantity} for shard in shards]}
+
+
+
+@router.post('/{book_id}/shards', status_code=status.HTTP_200_OK)
+def enable_stock_shards(user: verified_user_dependency, db: db_dependency, book_id: int,
+                        count: int = Query(default=8, ge=2, le=MAX_SHARDS, description="Number of stock counters to split the book over.")):
+    if user["role"] != "admin":
+        raise HTTPException(status_code=status.HTTP_203_NON_AUTHORITATIVE_INFORMATION, detail = "Admin privilages are required")
+
+    book_model = enable_shards(db, book_id, count)
     db.commit()
+    invalidate_book(book_id)
+    return {'book_id': book_id, 'stock_shards': book_model.stock_shards, 'stock_quantity': book_model.stock_quantity}
+
+
+
+@router.post('/{book_id}/shards/rebalance', status_code=status.HTTP_200_OK)
+def rebalance_stock_shards(user: verified_user_dependency, db: db_dependency, book_id: int):
+    if user["role"] != "admin":
+        raise HTTPException(status_code=status.HTTP_203_NON_AUTHORITATIVE_INFORMATION, detail = "Admin privilages are required")
+
+    book_model = rebalance_shards(db, book_id)
+    db.commit()
+    invalidate_book(book_id)
+    return {'book_id': book_id, 'stock_shards': book_model.stock_shards, 'stock_quantity': book_model.stock_quantity}
+
+
 
+@router.delete('/{book_id}/shards', status_code=status.HTTP_200_OK)
+def collapse_stock_shards(user: verified_user_dependency, db: db_dependency, book_id: int):
+    if user["role"] != "admin":
+        raise HTTPException(status_code=status.HTTP_203_NON_AUTHORITATIVE_INFORMATION, detail = "Admin privilages are required")
+
+    book_model = collapse_shards(db, book_id)
+    db.commit()
+    invalidate_book(book_id)
+    return {'book_id': book_id, 'stock_shards': book_model.stock_shards, 'stock_quantity': book_model.stock_quantity}
+
+
+
+@router.get('/cache-stats', status_code=status.HTTP_200_OK)
+def get_cache_stats(user: verified_user_dependency):
+    if user["role"] != "admin":
+        raise HTTPException(status_code=status.HTTP_203_NON_AUTHORITATIVE_INFORMATION, detail = "Admin privilages are required")
+
+    return {**cache_stats(), 'ai_search': ai_search_stats(), 'principal_cache': principal_cache.stats()}
+
+
+
+@router.get('/pool-stats', status_code=status.HTTP_200_OK)
+def get_pool_stats(user: verified_user_dependency):
+    if user["role"] != "admin":
+        raise HTTPException(status_code=status.HTTP_203_NON_AUTHORITATIVE_INFORMATION, detail = "Admin privilages are required")
 
+    return pool_stats()
 
-@router.get('/get-all-orders', status_code=status.HTTP_200_OK)
-async def get_my_orders(user: user_dependency, db: db_dependency):
-    if user.get('role') != 'admin' and not user:
+
+
+@router.get('/demand', status_code=status.HTTP_200_OK)
+async def get_demand(user: verified_user_dependency, db: async_db_dependency,
+                     grain: Literal["day", "week"] = Query(default="week"), domain: str | None = Query(default=None),
+                     book_id: int | None = Query(default=None, ge=1),
+                     start: date | None = Query(default=None), end: date | None = Query(default=None)):
+    if user["role"] != "admin":
+        raise HTTPException(status_code=status.HTTP_203_NON_AUTHORITATIVE_INFORMATION, detail = "Admin privilages are required")
+
+    rows = await db.execute(demand_query(grain, domain, book_id, start, end))
+    return [dict(row) for row in rows.mappings()]
+
+
+
+@router.get('/forecast', status_code=status.HTTP_200_OK)
+async def get_forecast(user: verified_user_dependency, db: async_db_dependency,
+                       domain: str = Query(..., description="Domain to forecast."), weeks: int = Query(default=4, ge=1, le=26)):
+    if user["role"] != "admin":
+        raise HTTPException(status_code=status.HTTP_203_NON_AUTHORITATIVE_INFORMATION, detail = "Admin privilages are required")
+
+    # imported here so pandas/scikit-learn only load once forecasting is used
+    import pandas as pd
+    from services.forecasting import forecast, ForecastUnavailable
+
+    rows = (await db.execute(demand_query("week", domain))).mappings().all()
+    demand = pd.DataFrame(rows, columns=["domain", "book_id", "period_start", "quantity", "revenue"])
+    # the domain's series runs to the latest week of the whole rollup, like the training matrix
+    data_end = (await db.execute(latest_period_query("week"))).scalar()
+    try:
+        return await run_in_threadpool(forecast, domain, demand, weeks, data_end)
+    except ForecastUnavailable as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+
+
+
+@router.get('/get-all-orders', status_code=status.HTTP_200_OK, response_model=OrderPage)
+async def get_my_orders(user: verified_user_dependency, db: async_db_dependency,
+                        limit: int = Query(default=100, ge=1, le=1000),
+                        cursor: str | None = Query(default=None, description="next_cursor returned by the previous page."),
+                        order_status: str | None = Query(default=None, alias="status", description="Only orders with this status.")):
+    if user.get('role') != 'admin':
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Authentication failed.")
     
-    user_order = db.query(Orders).all()
-    return user_order
+    # newest first by id, one primary key range scan per page; /admin/orders/export streams them all
+    query = select(Orders)
+    if order_status:
+        query = query.where(Orders.status == order_status.upper())
+    query = apply_keyset(query, Orders.id, Orders.id, "desc", limit, cursor, "id")
+
+    rows = (await db.execute(query)).scalars().all()
+    all_orders, next_cursor = next_page(rows, Orders.id, Orders.id, "desc", limit, "id")
+    return {'limit': limit, 'next_cursor': next_cursor, 'items': all_orders}
+
+
+
+EXPORT_COLUMNS = ['id', 'user_id', 'book_id', 'quantity', 'price_at_purchase', 'status', 'created_at']
+
+
+async def stream_orders(query, export_format: str, batch_size: int = 1000):
+    # own session: the request's dependencies may be closed before the body is streamed
+    async with AsyncSession_local() as db:
+        result = await db.stream(query.execution_options(yield_per=batch_size))
+
+        if export_format == "csv":
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(EXPORT_COLUMNS)
+            yield buffer.getvalue()
+
+        async for partition in result.mappings().partitions():
+            if export_format == "csv":
+                buffer.seek(0)
+                buffer.truncate()
+                writer.writerows([[row[column] for column in EXPORT_COLUMNS] for row in partition])
+                yield buffer.getvalue()
+            else:
+                yield "".join(json.dumps(dict(row), default=lambda value: value.isoformat()) + "\n" for row in partition)
+
+
+@router.get('/orders/export', status_code=status.HTTP_200_OK)
+async def export_orders(user: verified_user_dependency, export_format: Literal["ndjson", "csv"] = Query(default="ndjson", alias="format"),
+                        order_status: str | None = Query(default=None, alias="status"),
+                        created_from: datetime | None = Query(default=None), created_to: datetime | None = Query(default=None)):
+    if user["role"] != "admin":
+        raise HTTPException(status_code=status.HTTP_203_NON_AUTHORITATIVE_INFORMATION, detail = "Admin privilages are required")
+
+    query = select(*[getattr(Orders, column) for column in EXPORT_COLUMNS]).order_by(Orders.id)
+    if order_status:
+        query = query.where(Orders.status == order_status.upper())
+    if created_from:
+        query = query.where(Orders.created_at >= created_from)
+    if created_to:
+        query = query.where(Orders.created_at < created_to)
+
+    media_type = "text/csv" if export_format == "csv" else "application/x-ndjson"
+    return StreamingResponse(stream_orders(query, export_format), media_type=media_type,
+                             headers={"Content-Disposition": f"attachment; filename=orders.{export_format}"})
+
+
+
+@router.get("/order-events", status_code=status.HTTP_200_OK, response_model=OrderEventPage)
+async def get_order_events(user: verified_user_dependency, db: async_db_dependency,
+                           after: int = Query(default=0, ge=0, description="Last seq already consumed; 0 reads from the start."),
+                           limit: int = Query(default=500, ge=1, le=5000),
+                           order_id: int | None = Query(default=None)):
+    if user["role"] != "admin":
+        raise HTTPException(status_code=status.HTTP_203_NON_AUTHORITATIVE_INFORMATION, detail = "Admin privilages are required")
+
+    # each page is a range scan of the (txid, seq) index from the position of "after"
+    events = (await db.execute(events_query(db.bind.dialect.name, after, limit, order_id))).scalars().all()
+    return {'after': after,
+            'next_after': events[-1].seq if events else after,
+            'has_more': len(events) == limit,
+            'items': events}
+
+
+
+@router.patch("/orders/status", status_code=status.HTTP_200_OK)
+async def bulk_update_status(user: verified_user_dependency, bulk_update: BulkUpdateOrderStatus, db: async_db_dependency):
+
+    if user["role"] != "admin":
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Admin privilages are required")
+
+    new_status = bulk_update.status
+    if new_status not in valid_statuses:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid order status")
+
+    order_ids = list(dict.fromkeys(bulk_update.order_ids))
+    orders = {order.id: order for order in (await db.execute(
+        select(Orders).where(Orders.id.in_(order_ids)).order_by(Orders.id).with_for_update())).scalars()}
+
+    results = {}
+    accepted = []
+    for order_id in order_ids:
+        order = orders.get(order_id)
+        if not order:
+            results[order_id] = "Order not found"
+        elif new_status not in allowed_transitions.get(order.status, set()):
+            results[order_id] = f"Invalid order status transition from {order.status}"
+        else:
+            accepted.append(order)
+
+    books = {}
+    if accepted and new_status in ("CANCELLED", "DELIVERED"):
+        # only what the stock release and the sales rows need, no book rows locked or loaded
+        book_ids = sorted({order.book_id for order in accepted})
+        books = {book.id: book for book in (await db.execute(
+            select(Books.id, Books.stock_shards, Books.domain).where(Books.id.in_(book_ids))))}
+        for order in [order for order in accepted if order.book_id not in books]:
+            results[order.id] = "Book not found"
+            accepted.remove(order)
+
+    if new_status == "CANCELLED":
+        # one in-place stock update per book, in id order, however many of its orders are cancelled
+        restored = defaultdict(int)
+        for order in accepted:
+            restored[order.book_id] += order.quantity
+        for book_id, quantity in sorted(restored.items()):
+            if books[book_id].stock_shards:
+                await db.execute(shard_release_statement(book_id, quantity, books[book_id].stock_shards))
+                mark_stock_dirty(book_id)
+            else:
+                await db.execute(stock_release_statement(book_id, quantity))
+
+    if new_status == "DELIVERED" and accepted:
+        sale_date = datetime.now(timezone.utc).date()
+        sales = [{'book_id': order.book_id,
+                  'quantity': order.quantity,
+                  'price_at_sale': order.price_at_purchase,
+                  'domain': books[order.book_id].domain,
+                  'sale_date': sale_date} for order in accepted]
+        await db.execute(insert(Sales), sales)
+        await db.execute(sales_rollup_statement(db.bind.dialect.name, sales))
+
+    events = []
+    for order in accepted:
+        events.append(order_event(order, STATUS_CHANGED, new_status, order.status, user["id"]))
+        order.status = new_status
+        results[order.id] = None
+
+    for statement in append_event_statements(db.bind.dialect.name, events):
+        await db.execute(statement)
+    await db.commit()
+    if new_status == "CANCELLED":
+        invalidate_book(*books)
+
+    return {"status": new_status,
+            "updated": len(accepted),
+            "failed": len(order_ids) - len(accepted),
+            "results": [{"order_id": order_id, "ok": results[order_id] is None, "detail": results[order_id]} for order_id in order_ids]}
 
 
 
 @router.patch("/orders/{order_id}/status", status_code=status.HTTP_200_OK)
-async def update_status(user: user_dependency, update_status: UpdateOrderStatus, db: db_dependency, order_id: int):
+async def update_status(user: verified_user_dependency, update_status: UpdateOrderStatus, db: async_db_dependency, order_id: int):
 
-    db_user =  db.query(Users).filter(Users.id == user['id']).first()
-    if db_user.role != "admin":
+    if user["role"] != "admin":
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Admin privilages are required")
     
-    valid_statuses = ['PLACED', 'CANCELLED', 'CONFIRMED', 'SHIPPED', 'DELIVERED']
     new_status = update_status.status
     if new_status not in valid_statuses:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid order status")
-    
-    allowed_transitions = {
-        "PLACED": {"CONFIRMED", "CANCELLED"},
-        "CONFIRMED":{"SHIPPED", "CANCELLED"},
-        "SHIPPED": {"DELIVERED"},
-        "CANCELLED": set(),
-        "DELIVERED": set()
-    }
-
-    req_order = db.query(Orders).filter(Orders.id == order_id).first()
+
+    # locked, so two concurrent transitions of one order can't both pass the check below
+    req_order = await db.get(Orders, order_id, with_for_update=True)
     if not req_order:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Order not found")
 
@@ -137,14 +464,18 @@ async def update_status(user: user_dependency, update_status: UpdateOrderStatus,
         raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Invalid order status transition")
     
     if new_status == "CANCELLED":
-        fetched_book = db.query(Books).filter(Books.id == req_order.book_id).first()
-        if not fetched_book:
+        stock_shards = (await db.execute(select(Books.stock_shards).where(Books.id == req_order.book_id))).scalar_one_or_none()
+        if stock_shards is None:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail = "Book not found")
-        fetched_book.stock_quantity += req_order.quantity
+        if stock_shards:
+            await db.execute(shard_release_statement(req_order.book_id, req_order.quantity, stock_shards))
+            mark_stock_dirty(req_order.book_id)
+        else:
+            await db.execute(stock_release_statement(req_order.book_id, req_order.quantity))
     
     if new_status == "DELIVERED":
 
-        fetched_book = db.query(Books).filter(Books.id == req_order.book_id).first()
+        fetched_book = await db.get(Books, req_order.book_id)
         if not fetched_book:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Book not found")
 
@@ -157,9 +488,14 @@ async def update_status(user: user_dependency, update_status: UpdateOrderStatus,
         )
         
         db.add(sale_model)
+        await db.execute(sale_rollup_statement(db.bind.dialect.name, sale_model))
 
 
+    event = order_event(req_order, STATUS_CHANGED, new_status, current_status, user["id"])
     req_order.status = new_status
-    db.commit()
-    db.refresh(req_order)
+    for statement in append_event_statements(db.bind.dialect.name, [event]):
+        await db.execute(statement)
+    await db.commit()
+    if new_status == "CANCELLED":
+        invalidate_book(req_order.book_id)
     return {"message": "Order status updated successfully", "order_id": req_order.id, "status": req_order.status}
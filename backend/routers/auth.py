@@ -8,8 +8,14 @@ from database import Session_local
 from fastapi.security import OAuth2PasswordRequestForm, OAuth2PasswordBearer 
 from jose import JWTError, jwt
 from datetime import timedelta, timezone, datetime
-from database import db_dependency
-from schemas.user import CreateUserRequest, Token
+from database import async_db_dependency, AsyncSession_local, async_engine
+from fastapi.concurrency import run_in_threadpool
+from services.cache import TTLCache
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import os
+from sqlalchemy import select
+from schemas.user import CreateUserRequest, Token, UserResponse
 
 
 router = APIRouter()
@@ -20,21 +26,42 @@ SECRET_KEY = 'my_scret_key'
 ALGORITHM = 'HS256' 
 
 
-bcrypt_context = CryptContext(schemes = ['bcrypt'], deprecated = 'auto')
+# bcrypt cost factor; hashes made with another cost are upgraded on the next login
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+
+bcrypt_context = CryptContext(schemes = ['bcrypt'], deprecated = 'auto', bcrypt__rounds = BCRYPT_ROUNDS)
+
+# bcrypt releases the GIL, so a few threads keep hashing off the event loop without
+# letting a login storm take every core
+hashing_pool = ThreadPoolExecutor(max_workers = int(os.getenv("PASSWORD_HASH_WORKERS", "4")), thread_name_prefix = "bcrypt")
 oauth2_bearer = OAuth2PasswordBearer(tokenUrl = '/login')
 
 
-def authenticate_user(username: str, password: str, db):
-    user = db.query(Users).filter(Users.username == username).first()
+async def hash_password(password: str) -> str:
+    return await asyncio.get_running_loop().run_in_executor(hashing_pool, bcrypt_context.hash, password)
+
+
+async def verify_password(password: str, hashed_password: str):
+    """Returns (valid, new_hash), new_hash is set when the stored hash uses an outdated cost."""
+    return await asyncio.get_running_loop().run_in_executor(hashing_pool, bcrypt_context.verify_and_update, password, hashed_password)
+
+
+async def authenticate_user(username: str, password: str, db):
+    user = (await db.execute(select(Users).filter(Users.username == username))).scalars().first()
     if not user:
         return False
-    if not bcrypt_context.verify(password, user.hashed_password):
+    valid, new_hash = await verify_password(password, user.hashed_password)
+    if not valid:
         return False
+    if new_hash:
+        # BCRYPT_ROUNDS changed since this password was hashed
+        user.hashed_password = new_hash
+        await db.commit()
     return user
     
 
-def create_access_token(username: str, user_id: int, expires_delta: timedelta):
-    encode = {'sub': username, 'id': user_id}
+def create_access_token(username: str, user_id: int, expires_delta: timedelta, role: str | None = None, is_active: bool = True):
+    encode = {'sub': username, 'id': user_id, 'role': role, 'active': is_active}
     expires = datetime.now(timezone.utc) + expires_delta 
     encode.update({'exp': expires})
     return jwt.encode(encode, SECRET_KEY, algorithm = ALGORITHM) 
@@ -47,7 +74,9 @@ async def get_current_user(token:Annotated[str, Depends(oauth2_bearer)]):
         user_id: int = payload.get('id')
         if username is None or user_id is None:
             raise HTTPException(status_code = status.HTTP_401_UNAUTHORIZED, detail = "Could not validate user.")
-        return {'username':username, 'id':user_id}
+        if payload.get('active') is False:
+            raise HTTPException(status_code = status.HTTP_401_UNAUTHORIZED, detail = "User is inactive.")
+        return {'username':username, 'id':user_id, 'role':payload.get('role'), 'is_active':payload.get('active', True)}
     except JWTError:
         raise HTTPException(status_code = status.HTTP_401_UNAUTHORIZED, detail = "Could not validate user.")
         
@@ -55,40 +84,81 @@ async def get_current_user(token:Annotated[str, Depends(oauth2_bearer)]):
 user_dependency = Annotated[dict, Depends(get_current_user)]
 
 
+# user id -> (role, is_active) as last read from the database
+principal_cache = TTLCache(maxsize = int(os.getenv("PRINCIPAL_CACHE_SIZE", "4096")),
+                           ttl = float(os.getenv("PRINCIPAL_CACHE_TTL", "30")))
+
+
+def load_user(user_id: int):
+    with Session_local() as db:
+        return db.get(Users, user_id)
+
+
+async def get_verified_user(user: user_dependency):
+    """Like get_current_user, but re-checks role and is_active against the database.
+
+    The lookup is cached for PRINCIPAL_CACHE_TTL seconds, so a revoked role or a
+    deactivated account takes effect within that window at no per-request cost.
+    With PRINCIPAL_CACHE_TTL=0 the signed role and is_active claims are trusted as is.
+    """
+    if principal_cache.ttl <= 0:
+        return user
+
+    principal = principal_cache.get(user['id'])
+    if principal is None:
+        if async_engine is not None:
+            async with AsyncSession_local() as db:
+                db_user = await db.get(Users, user['id'])
+        else:
+            # no async driver: the sync routes keep working, so does their admin check
+            db_user = await run_in_threadpool(load_user, user['id'])
+        if not db_user:
+            raise HTTPException(status_code = status.HTTP_401_UNAUTHORIZED, detail = "Could not validate user.")
+        principal = (db_user.role, db_user.is_active)
+        principal_cache.set(user['id'], principal)
+
+    role, is_active = principal
+    if not is_active:
+        raise HTTPException(status_code = status.HTTP_401_UNAUTHORIZED, detail = "User is inactive.")
+    return {**user, 'role': role, 'is_active': is_active}
+
+
+verified_user_dependency = Annotated[dict, Depends(get_verified_user)]
+
+
 @router.post("/create-user", status_code = status.HTTP_201_CREATED)
-async def create_user(db: db_dependency, create_user_request: CreateUserRequest):
+async def create_user(db: async_db_dependency, create_user_request: CreateUserRequest):
 
-    existing_user = db.query(Users).filter(Users.username == create_user_request.username).first()
+    existing_user = (await db.execute(select(Users).filter(Users.username == create_user_request.username))).scalars().first()
     if existing_user:
         raise HTTPException(status_code = status.HTTP_400_BAD_REQUEST, detail = "Username already exists")
 
     create_user_request = Users(
         email = create_user_request.email,
         username = create_user_request.username,
-        hashed_password = bcrypt_context.hash(create_user_request.password),
+        hashed_password = await hash_password(create_user_request.password),
         role = create_user_request.role,
         is_active = True
     )
     db.add(create_user_request)
-    db.commit()
-    db.refresh(create_user_request)
+    await db.commit()
     return {"message": "User created successfully"}
 
 
 
 @router.post("/login", response_model=Token)
-async def login_for_access_token(form_data: Annotated[OAuth2PasswordRequestForm, Depends()], db: db_dependency):
-    user = authenticate_user(form_data.username, form_data.password, db)
+async def login_for_access_token(form_data: Annotated[OAuth2PasswordRequestForm, Depends()], db: async_db_dependency):
+    user = await authenticate_user(form_data.username, form_data.password, db)
     if not user:
         raise HTTPException(status_code = status.HTTP_401_UNAUTHORIZED, detail = "Invalid username or password!")
-    token = create_access_token(user.username, user.id, timedelta(minutes = 20))
+    token = create_access_token(user.username, user.id, timedelta(minutes = 20), role = user.role, is_active = user.is_active)
     return {'access_token': token, 'token_type': 'bearer'}
 
 
 
-@router.get('/get-details', status_code = status.HTTP_200_OK)
-async def get_user_details(user: user_dependency, db: db_dependency):
-    verify = (db.query(Users).filter(Users.id == user["id"]).first())
+@router.get('/get-details', status_code = status.HTTP_200_OK, response_model = UserResponse)
+async def get_user_details(user: user_dependency, db: async_db_dependency):
+    verify = await db.get(Users, user["id"])
     if not verify:
         raise HTTPException(status_code = status.HTTP_404_NOT_FOUND, detail = "User not found")
     return verify
@@ -1,15 +1,20 @@
-from fastapi import APIRouter, HTTPException, Depends, Path, Query, Body
+from fastapi import APIRouter, HTTPException, Depends, Path, Query, Body, Request, Response
+from fastapi.concurrency import run_in_threadpool
 from starlette import status
 from pydantic import BaseModel, Field
-from typing import Annotated, Optional
+from typing import Annotated, Optional, Literal
 from database import Session_local, engine
 from models import Books, Users, Orders
-from schemas.book import Book, updateBook
+from schemas.book import Book, updateBook, BookResponse, BookPage, BookCursorPage, BookSearchPage
 from database import db_dependency
 from sqlalchemy import select
 from sqlalchemy.orm import session
 import math
-from services.ai_search import AISearch, chain
+from services.ai_search import AISearch, parse_query, keyword_filters
+from services.pagination import apply_keyset, next_page
+from services.catalog import book_filters, book_rows, fetch_books, count_books, get_cached_book, known_domains, catalog_state, stock_window, last_modified
+from services.conditional import make_etag, validator_headers, is_not_modified
+from services.search import ranked_search, MAX_SEARCH_RESULTS
 
 
 router = APIRouter(
@@ -26,20 +31,27 @@ class AISearchRequest(BaseModel):
 
 
 
-@router.get('/', status_code = status.HTTP_200_OK)
+@router.get('/', status_code = status.HTTP_200_OK, response_model = BookPage | BookCursorPage)
 def get_books(
-    db: db_dependency, page: int = Query(default=1, ge=1), page_size: int = Query(default=10, ge=1, le=50),
+    db: db_dependency, request: Request, response: Response, page: int = Query(default=1, ge=1), page_size: int = Query(default=10, ge=1, le=50),
     domain: str | None = Query(default=None), max_price: int | None = Query(default=None, ge=0),
-    sort_by: str | None = Query(default="id"), order: str = Query(default="asc")):
+    sort_by: str | None = Query(default="id"), order: str = Query(default="asc"),
+    pagination: Literal["offset", "cursor"] = Query(default="offset", description="Use 'cursor' for keyset pagination."),
+    cursor: str | None = Query(default=None, description="next_cursor returned by the previous page in cursor mode.")):
+
+    # validated against the shared catalog version: an unchanged page skips the list query
+    version, changed_at = catalog_state(db)
+    window = stock_window()
+    etag = make_etag(version, window, sorted(request.query_params.multi_items()), weak=True)
+    modified = last_modified(changed_at, window)
+    headers = validator_headers(etag, modified)
+    if is_not_modified(request, etag, modified):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    response.headers.update(headers)
     
     offset = (page - 1) * page_size
-    query = db.query(Books)
-
-    if domain:
-        query = query.filter(Books.domain.ilike(f"%{domain}%"))
-    
-    if max_price is not None:
-        query = query.filter(Books.price <= max_price)
+    # list pages are read as plain dicts, no ORM objects are built
+    query = book_rows().where(*book_filters(domain, max_price))
     
     #sorting
     allowed_sorting_fields = {
@@ -54,31 +66,59 @@ def get_books(
 
     sort_column = allowed_sorting_fields[sort_by]
 
+    if pagination == "cursor":
+        direction = "desc" if order == "desc" else "asc"
+        rows = fetch_books(db, apply_keyset(query, sort_column, Books.id, direction, page_size, cursor, sort_by,
+                                            db.get_bind().dialect.name))
+        items, next_cursor = next_page(rows, sort_column, Books.id, direction, page_size, sort_by)
+        return {'page_size':page_size, 'next_cursor':next_cursor, 'items':items}
+
     if order == "desc":
         query = query.order_by(sort_column.desc())
     else:
         query = query.order_by(sort_column.asc())
 
 
-    total_items = db.query(Books).count()
+    total_items = count_books(db, domain, max_price, version)
     total_pages = math.ceil(total_items/ page_size)
-    items = (query.order_by(Books.id).limit(page_size).offset(offset).all())
+    items = fetch_books(db, query.order_by(Books.id).limit(page_size).offset(offset))
     return {'current page':page, 'page_size':page_size, 'total_items':total_items, 'total_pages':total_pages, 'items':items}
 
     
 
-@router.get('/{book_id}', status_code = status.HTTP_200_OK)
-def get_book( db: db_dependency, book_id: int = Path(..., description = "Enter the id of the book which you want to fetch.", ge = 1)):
-    book_model = db.query(Books).filter(Books.id == book_id).first()
+@router.get('/{book_id}', status_code = status.HTTP_200_OK, response_model = BookResponse)
+def get_book( db: db_dependency, request: Request, response: Response, book_id: int = Path(..., description = "Enter the id of the book which you want to fetch.", ge = 1)):
+    book_model = get_cached_book(db, book_id)
     if not book_model:
         raise HTTPException(status_code = status.HTTP_404_NOT_FOUND, detail = "Book not found.")
+
+    # validated against the cached record, so a 304 costs no query; writes made by
+    # another process show up once the entry expires (BOOK_CACHE_TTL)
+    etag = make_etag(book_model)
+    modified = last_modified(book_model['updated_at'], stock_window())
+    headers = validator_headers(etag, modified)
+    if is_not_modified(request, etag, modified):
+        return Response(status_code = status.HTTP_304_NOT_MODIFIED, headers = headers)
+    response.headers.update(headers)
     return book_model
     
 
 
-@router.get('/search/', status_code = status.HTTP_200_OK)
-def search_book(db: db_dependency, domain: str = Query(..., description = "Enter the domain of the book.")):
-    book_model = db.query(Books).filter(Books.domain.ilike(f"%{domain}%")).all()
+@router.get('/search/', status_code = status.HTTP_200_OK, response_model = list[BookResponse])
+def search_book(db: db_dependency, domain: str | None = Query(default = None, description = "Enter the domain of the book."),
+                query: str | None = Query(default = None, min_length = 1, description = "Ranked full-text search over title, author and domain."),
+                page: int = Query(default = 1, ge = 1, description = f"Full-text results stop after the best {MAX_SEARCH_RESULTS} matches."),
+                page_size: int = Query(default = 20, ge = 1, le = 100)):
+    offset = (page - 1) * page_size
+    if query:
+        if offset + page_size > MAX_SEARCH_RESULTS:
+            raise HTTPException(status_code = status.HTTP_400_BAD_REQUEST,
+                                detail = f"Search results are limited to the best {MAX_SEARCH_RESULTS} matches, refine the query.")
+        book_model = ranked_search(db, query, limit = page_size, offset = offset)
+    elif domain:
+        book_model = fetch_books(db, book_rows().where(Books.domain.ilike(f"%{domain}%")).order_by(Books.id).limit(page_size).offset(offset))
+    else:
+        raise HTTPException(status_code = status.HTTP_400_BAD_REQUEST, detail = "Provide either query or domain.")
     if not book_model:
         raise HTTPException(status_code = status.HTTP_404_NOT_FOUND, detail = "Book not found.")
     return book_model
@@ -103,13 +143,7 @@ def search_book(db: db_dependency, domain: str = Query(..., description = "Enter
 
 #AI Search
 def validate_and_forward_output(db, filters: AISearch, page: int, page_size: int):
-    query = db.query(Books)
-
-    if filters.domain:
-        query = query.filter(Books.domain.ilike(f"%{filters.domain}%"))
-    
-    if filters.max_price is not None:
-        query = query.filter(Books.price <= filters.max_price)
+    query = book_rows().where(*book_filters(filters.domain, filters.max_price))
 
     if filters.sort_by:
         column = getattr(Books, filters.sort_by)
@@ -122,23 +156,25 @@ def validate_and_forward_output(db, filters: AISearch, page: int, page_size: int
     else:
         query = query.order_by(Books.id.asc())
 
-    total_items = query.count()
+    total_items = count_books(db, filters.domain, filters.max_price)
     total_pages = math.ceil(total_items/ page_size)
     offset = (page - 1) * page_size
 
-    results = query.offset(offset).limit(page_size).all()
+    results = fetch_books(db, query.offset(offset).limit(page_size))
     return {'current_page':page, 'page_size':page_size, 'total_items':total_items, 'total_pages':total_pages, 'results':results}
 
 
 
-@router.post('/ai-search', status_code = status.HTTP_201_CREATED)
-def search_using_ai(request: AISearchRequest, db: db_dependency):
-    try:
-        filters: AISearch = chain.invoke({"query": request.query})
-
-    except Exception as e:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"AI parsing failed: {str(e)}")
+@router.post('/ai-search', status_code = status.HTTP_201_CREATED, response_model = BookSearchPage)
+async def search_using_ai(request: AISearchRequest, db: db_dependency):
+    # falls back to keyword filters (degraded) when the LLM is slow, failing or switched off by the breaker
+    domains = await run_in_threadpool(known_domains, db)
+    filters, degraded = await parse_query(request.query, domains = domains)
+    if degraded:
+        filters = keyword_filters(request.query, domains)
     
     print(filters.domain, filters.max_price, filters.sort_by, filters.order)
 
-    return validate_and_forward_output(db=db, filters=filters, page=request.page, page_size=request.page_size)
+    result = await run_in_threadpool(validate_and_forward_output, db=db, filters=filters, page=request.page, page_size=request.page_size)
+    result['degraded'] = degraded
+    return result
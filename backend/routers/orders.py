@@ -5,13 +5,29 @@ from typing import Annotated, Optional
 from database import Session_local, engine
 from models import Books, Users, Orders
 from schemas.book import Book, updateBook
+from schemas.order import OrderResponse, OrderPage
 from routers.auth import get_current_user, user_dependency
-from database import db_dependency
+from database import db_dependency, async_db_dependency
+from services.inventory import reserve_stock, take_stock
+from services.catalog import invalidate_book
+from services.pagination import apply_keyset, next_page
+from services.order_events import order_event, append_event_statements, CREATED
+from sqlalchemy import insert, select
+from collections import defaultdict
 
 
 class CreateOrder(BaseModel):
     book_id: int = Field(..., description="Id of the book you want to puchase.")
-    quantity: int = Field(..., description="Quantity of the book you want to purchase.")
+    quantity: int = Field(..., gt=0, description="Quantity of the book you want to purchase.")
+
+
+class OrderLine(BaseModel):
+    book_id: int = Field(..., description="Id of the book you want to puchase.")
+    quantity: int = Field(..., gt=0, description="Quantity of the book you want to purchase.")
+
+
+class CreateBatchOrder(BaseModel):
+    items: list[OrderLine] = Field(..., min_length=1, max_length=100, description="Books and quantities to order together.")
 
 
 router = APIRouter(
@@ -19,42 +35,95 @@ router = APIRouter(
     tags = ['orders']
 )
 
-@router.post('/', status_code=status.HTTP_201_CREATED) 
+@router.post('/', status_code=status.HTTP_201_CREATED, response_model=OrderResponse)
 def create_order(user: user_dependency, db: db_dependency, order_request: CreateOrder):
     
     # verify_user = db.query(Users).filter(Users.id == user.get('id')).first()
     # if not verify_user:
     #     raise HTTPException(status_code = status.HTTP_401_UNAUTHORIZED, detail = "Not Authenticated.")
 
-    required_book = db.query(Books).filter(Books.id == order_request.book_id).first()
-    if not required_book:
-        raise HTTPException(status_code = status.HTTP_404_NOT_FOUND, detail = "Book not found.")
-    
-    quantity_in_stock = required_book.stock_quantity
-    if quantity_in_stock < order_request.quantity:
-        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_CONTENT, detail = "Insufficient stock.")
+    # check and decrement the stock in one conditional UPDATE so parallel orders can't oversell
+    price = reserve_stock(db, order_request.book_id, order_request.quantity)
 
     order_model = Orders(**order_request.model_dump(),
                         user_id = user.get('id'),
-                        price_at_purchase = required_book.price)
-    
-    # reducing the stock in Books table
-    required_book.stock_quantity -= order_request.quantity
+                        price_at_purchase = price)
 
     db.add(order_model)
+    db.flush()
+    for statement in append_event_statements(db.bind.dialect.name, [order_event(order_model, CREATED, order_model.status)]):
+        db.execute(statement)
     db.commit()
+    invalidate_book(order_request.book_id)
     db.refresh(order_model)
 
     return order_model
+
+
+
+@router.post('/batch', status_code=status.HTTP_201_CREATED, response_model=list[OrderResponse])
+def create_batch_order(user: user_dependency, db: db_dependency, batch_request: CreateBatchOrder):
+
+    # the same book may appear on several lines, reserve its total once
+    requested = defaultdict(int)
+    for line in batch_request.items:
+        requested[line.book_id] += line.quantity
+
+    found = set(db.scalars(select(Books.id).where(Books.id.in_(requested))))
+    missing = [book_id for book_id in requested if book_id not in found]
+    if missing:
+        raise HTTPException(status_code = status.HTTP_404_NOT_FOUND, detail = f"Book not found: {missing}")
+
+    # the same conditional UPDATE as create_order, one per book, in id order so
+    # concurrent batches lock rows in the same order and can't deadlock
+    prices = {}
+    short = []
+    for book_id in sorted(requested):
+        price = take_stock(db, book_id, requested[book_id])
+        if price is None:
+            short.append(book_id)
+        else:
+            prices[book_id] = price
+    if short:
+        db.rollback()
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_CONTENT, detail = f"Insufficient stock: {short}")
+
+    # RETURNING carries every column the CREATED events need, no ORM instances until after the commit
+    created = db.execute(
+        insert(Orders).returning(Orders.id, Orders.user_id, Orders.book_id, Orders.quantity, Orders.status,
+                                 sort_by_parameter_order = True),
+        [{'book_id': line.book_id,
+          'quantity': line.quantity,
+          'user_id': user.get('id'),
+          'price_at_purchase': prices[line.book_id],
+          'status': 'PLACED'} for line in batch_request.items]
+    ).all()
+    for statement in append_event_statements(db.bind.dialect.name, [order_event(order, CREATED, order.status) for order in created]):
+        db.execute(statement)
+    db.commit()
+    invalidate_book(*requested)
+
+    # loaded after the commit: instances loaded before it would be expired and refreshed one SELECT per line
+    return db.query(Orders).filter(Orders.id.in_([order.id for order in created])).order_by(Orders.id).all()
     
 
 
-@router.get('/get-my-orders', status_code=status.HTTP_200_OK)
-async def get_my_orders(user: user_dependency, db: db_dependency):
+@router.get('/get-my-orders', status_code=status.HTTP_200_OK, response_model=OrderPage)
+async def get_my_orders(user: user_dependency, db: async_db_dependency,
+                        limit: int = Query(default=50, ge=1, le=200),
+                        cursor: str | None = Query(default=None, description="next_cursor returned by the previous page."),
+                        order_status: str | None = Query(default=None, alias="status", description="Only orders with this status.")):
     if not user:
         raise HTTPException(status_code = status.HTTP_401_UNAUTHORIZED, detail = "Not Authenticated.")
     
-    user_order = db.query(Orders).filter(Orders.user_id == user.get('id')).all()
+    # newest first, served by the (user_id, created_at desc, id desc) index
+    query = select(Orders).filter(Orders.user_id == user.get('id'))
+    if order_status:
+        query = query.filter(Orders.status == order_status.upper())
+    query = apply_keyset(query, Orders.created_at, Orders.id, "desc", limit, cursor, "created_at", db.bind.dialect.name)
+
+    rows = (await db.execute(query)).scalars().all()
+    user_order, next_cursor = next_page(rows, Orders.created_at, Orders.id, "desc", limit, "created_at")
     
-    return user_order
+    return {'limit': limit, 'next_cursor': next_cursor, 'items': user_order}
 
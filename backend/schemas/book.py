@@ -1,5 +1,6 @@
 from typing import Annotated, Optional
-from pydantic import BaseModel, Field
+from datetime import datetime
+from pydantic import BaseModel, Field, ConfigDict
 
 
 class Book(BaseModel):
@@ -8,6 +9,7 @@ class Book(BaseModel):
     domain: Annotated[str, Field(..., title = 'Domain', description = 'Domain of the book.')]
     price: Annotated[int, Field(..., title = 'Price', description = 'Price of the book.')]
     stock_quantity: Annotated[int, Field(..., title = 'Stock Quantity', description = 'Quantity avaliable in stock.')]
+    sku: Annotated[Optional[str], Field(None, title = 'SKU', description = 'Supplier SKU of the book.')]
 
 
 class updateBook(BaseModel):
@@ -17,3 +19,40 @@ class updateBook(BaseModel):
     price: Annotated[int, Field(Optional, title = 'Price', description = 'Price of the book.')]
     stock_quantity: Annotated[int, Field(Optional, title = 'Stock Quantity', description = 'Quantity avaliable in stock.')]
 
+
+
+class BookResponse(BaseModel):
+    model_config = ConfigDict(from_attributes = True)
+
+    id: int
+    title: str
+    author: str
+    domain: Optional[str] = None
+    price: int
+    stock_quantity: int
+    sku: Optional[str] = None
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+
+
+class BookPage(BaseModel):
+    current_page: int = Field(alias = 'current page')
+    page_size: int
+    total_items: int
+    total_pages: int
+    items: list[BookResponse]
+
+
+class BookCursorPage(BaseModel):
+    page_size: int
+    next_cursor: Optional[str] = None
+    items: list[BookResponse]
+
+
+class BookSearchPage(BaseModel):
+    current_page: int
+    page_size: int
+    total_items: int
+    total_pages: int
+    results: list[BookResponse]
+    degraded: bool = False
@@ -0,0 +1,43 @@
+from typing import Optional
+from datetime import datetime
+from pydantic import BaseModel, ConfigDict
+
+
+class OrderResponse(BaseModel):
+    model_config = ConfigDict(from_attributes = True)
+
+    id: int
+    user_id: int
+    book_id: int
+    quantity: int
+    price_at_purchase: int
+    status: str
+    created_at: datetime
+
+
+class OrderPage(BaseModel):
+    limit: int
+    next_cursor: Optional[str] = None
+    items: list[OrderResponse]
+
+
+class OrderEventResponse(BaseModel):
+    model_config = ConfigDict(from_attributes = True)
+
+    seq: int
+    order_id: int
+    event_type: str
+    from_status: Optional[str] = None
+    to_status: str
+    user_id: int
+    book_id: int
+    quantity: int
+    actor_id: Optional[int] = None
+    created_at: datetime
+
+
+class OrderEventPage(BaseModel):
+    after: int
+    next_after: int
+    has_more: bool
+    items: list[OrderEventResponse]
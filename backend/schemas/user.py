@@ -1,4 +1,6 @@
-from pydantic import BaseModel, EmailStr, Field
+from typing import Optional
+from datetime import datetime
+from pydantic import BaseModel, EmailStr, Field, ConfigDict
 
 class CreateUserRequest(BaseModel):
     email: EmailStr
@@ -9,4 +11,15 @@ class CreateUserRequest(BaseModel):
 
 class Token(BaseModel):
     access_token: str
-    token_type: str
\ No newline at end of file
+    token_type: str
+
+
+class UserResponse(BaseModel):
+    model_config = ConfigDict(from_attributes = True)
+
+    id: int
+    email: Optional[str] = None
+    username: str
+    role: Optional[str] = None
+    is_active: Optional[bool] = None
+    created_at: datetime
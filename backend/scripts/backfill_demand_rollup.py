@@ -0,0 +1,36 @@
+#Backfill script: rebuilds the demand_rollups table from historical_sales and sales.
+#Safe to re-run, the rollup is replaced in a single transaction.
+#usage: python scripts/backfill_demand_rollup.py
+import sys
+import os
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy.orm import Session
+from database import Session_local
+from services.rollup import rebuild_rollups
+
+
+
+def backfill():
+    print("Rebuilding demand rollup.....")
+    db: Session = Session_local()
+    start = time.perf_counter()
+
+    try:
+        rows = rebuild_rollups(db)
+        db.commit()
+        print(f"Demand rollup rebuilt: {rows} buckets in {time.perf_counter() - start:.2f}s")
+
+    except Exception as e:
+        db.rollback()
+        print("Error: ", e)
+        raise
+
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    backfill()
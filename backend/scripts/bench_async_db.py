@@ -0,0 +1,85 @@
+#Throughput benchmark: the same order-history query served from an async def route
+#through the blocking sync Session (the old pattern) and through the AsyncSession.
+#With concurrency above the sync pool size (5 + 10 overflow) the sync path can stall the
+#event loop on connection checkout, which is exactly the failure mode being measured.
+#usage: python scripts/bench_async_db.py [requests] [concurrency]
+import sys
+import os
+import asyncio
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from fastapi import FastAPI
+from sqlalchemy import select, func
+from database import Session_local, db_dependency, async_db_dependency
+from models import Orders, Users, Books
+
+
+app = FastAPI()
+
+@app.get('/sync-session')
+async def sync_session_orders(db: db_dependency, user_id: int):
+    return db.query(Orders).filter(Orders.user_id == user_id).limit(50).all()
+
+@app.get('/async-session')
+async def async_session_orders(db: async_db_dependency, user_id: int):
+    return (await db.execute(select(Orders).filter(Orders.user_id == user_id).limit(50))).scalars().all()
+
+
+
+def seed(orders: int = 200):
+    db = Session_local()
+    bench_user = db.query(Users).filter(Users.username == "bench-user").first()
+    if not bench_user:
+        bench_user = Users(username = "bench-user", hashed_password = "!", role = "customer")
+        db.add(bench_user)
+        db.commit()
+
+    existing = db.query(func.count(Orders.id)).filter(Orders.user_id == bench_user.id).scalar()
+    if existing < orders:
+        book = Books(title = "bench", author = "bench", domain = "bench", price = 100, stock_quantity = 0)
+        db.add(book)
+        db.flush()
+        db.add_all([Orders(user_id = bench_user.id, book_id = book.id, quantity = 1, price_at_purchase = 100)
+                    for _ in range(orders - existing)])
+        db.commit()
+    user_id = bench_user.id
+    db.close()
+    return user_id
+
+
+async def run(path: str, user_id: int, total: int, concurrency: int):
+    limit = asyncio.Semaphore(concurrency)
+    transport = httpx.ASGITransport(app = app)
+
+    async with httpx.AsyncClient(transport = transport, base_url = "http://bench") as client:
+        async def one():
+            async with limit:
+                try:
+                    response = await client.get(path, params = {'user_id': user_id})
+                    return response.status_code == 200
+                except Exception:
+                    return False
+
+        await one()  # warm up the pool
+        start = time.perf_counter()
+        results = await asyncio.gather(*(one() for _ in range(total)))
+        elapsed = time.perf_counter() - start
+
+    ok = sum(results)
+    print(f"{path:<16} {ok / elapsed:8.1f} req/s  ({total} requests, {total - ok} failed, concurrency {concurrency})")
+
+
+async def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    user_id = seed()
+
+    await run('/sync-session', user_id, total, concurrency)
+    await run('/async-session', user_id, total, concurrency)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
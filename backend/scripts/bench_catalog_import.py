@@ -0,0 +1,90 @@
+#Catalog import benchmark: generates a synthetic supplier catalog and reports rows/sec
+#of the bulk upsert for several batch sizes, next to one add_book-style insert and
+#commit per row. A second pass over the same file measures the update path.
+#Synthetic books use "bench-" authors and are removed afterwards.
+#usage: python scripts/bench_catalog_import.py [rows] [batch_size ...]
+import sys
+import os
+import csv
+import random
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import Session_local
+from models import Books
+from services.catalog_import import import_lines
+
+
+
+def write_csv(path: str, rows: int, seed: int = 7):
+    rng = random.Random(seed)
+    with open(path, "w", newline = "") as f:
+        writer = csv.writer(f)
+        writer.writerow(["title", "author", "domain", "price", "stock_quantity", "sku"])
+        for i in range(rows):
+            writer.writerow([f"Bench title {i}", f"bench-{i % 500}", f"domain-{rng.randint(0, 19)}",
+                             rng.randint(100, 5000), rng.randint(0, 300), f"BENCH-{i:08d}"])
+
+
+def per_row_load(path: str, limit: int):
+    """One ORM insert and one commit per book, what POST /admin/ does."""
+    db = Session_local()
+    start = time.perf_counter()
+    with open(path, newline = "") as f:
+        for index, row in enumerate(csv.DictReader(f)):
+            if index == limit:
+                break
+            db.add(Books(title = row["title"], author = row["author"], domain = row["domain"],
+                         price = int(row["price"]), stock_quantity = int(row["stock_quantity"]), sku = row["sku"]))
+            db.commit()
+    elapsed = time.perf_counter() - start
+    db.close()
+    return limit, elapsed
+
+
+def bulk_load(path: str, batch_size: int):
+    db = Session_local()
+    start = time.perf_counter()
+    with open(path, newline = "") as f:
+        report = import_lines(db, f, "csv", "sku", batch_size)
+    elapsed = time.perf_counter() - start
+    db.close()
+    return report['rows'], elapsed
+
+
+def cleanup():
+    db = Session_local()
+    db.query(Books).filter(Books.author.like("bench-%")).delete(synchronize_session = False)
+    db.commit()
+    db.close()
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    batch_sizes = [int(arg) for arg in sys.argv[2:]] or [500, 1000, 5000]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench_catalog.csv")
+        write_csv(path, rows)
+
+        try:
+            cleanup()
+            # the per-row path is slow enough that a sample gives a stable rate
+            count, elapsed = per_row_load(path, min(rows, 2000))
+            print(f"{'per-row commit':<24}{count:>10} rows {elapsed:8.2f}s {count / elapsed:>12,.0f} rows/sec")
+            cleanup()
+
+            for batch_size in batch_sizes:
+                count, elapsed = bulk_load(path, batch_size)
+                print(f"{f'bulk insert ({batch_size})':<24}{count:>10} rows {elapsed:8.2f}s {count / elapsed:>12,.0f} rows/sec")
+                count, elapsed = bulk_load(path, batch_size)
+                print(f"{f'bulk update ({batch_size})':<24}{count:>10} rows {elapsed:8.2f}s {count / elapsed:>12,.0f} rows/sec")
+                cleanup()
+        finally:
+            cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+#ETL benchmark: generates a synthetic sales CSV and reports rows/sec of the streaming
+#loader for several batch sizes, next to the old one-db.add()-per-row load.
+#Synthetic rows use "bench-" domains and are removed afterwards.
+#usage: python scripts/bench_etl.py [rows] [batch_size ...]
+import sys
+import os
+import csv
+import random
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+from database import Session_local
+from models import HistoricalSales
+from load_historical_sales import load_data
+
+
+
+def write_csv(path: str, rows: int):
+    rng = random.Random(7)
+    start = date(2015, 1, 1)
+    with open(path, "w", newline = "") as f:
+        writer = csv.writer(f)
+        writer.writerow(["sale_date", "domain", "quantity"])
+        for i in range(rows):
+            writer.writerow([start + timedelta(days = i // 40), f"bench-{rng.randint(0, 19)}", rng.randint(1, 200)])
+
+
+def per_row_load(path: str):
+    """The original loader: whole file in memory, one ORM object per row, one commit."""
+    df = pd.read_csv(path)
+    df["sale_date"] = pd.to_datetime(df["sale_date"]).dt.date
+    db = Session_local()
+    start = time.perf_counter()
+    # every row gets its own domain so the raw rows fit the (domain, sale_date) key
+    for index, row in enumerate(df.itertuples(index=False)):
+        db.add(HistoricalSales(domain = f"{row.domain}-{index}", quantity = int(row.quantity), sale_date = row.sale_date))
+    db.commit()
+    elapsed = time.perf_counter() - start
+    db.close()
+    return len(df), elapsed
+
+
+def cleanup():
+    db = Session_local()
+    db.query(HistoricalSales).filter(HistoricalSales.domain.like("bench-%")).delete(synchronize_session = False)
+    db.commit()
+    db.close()
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    batch_sizes = [int(arg) for arg in sys.argv[2:]] or [10000, 50000, 200000]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench_sales.csv")
+        write_csv(path, rows)
+
+        try:
+            results = []
+            for batch_size in batch_sizes:
+                cleanup()
+                loaded, elapsed = load_data(path, batch_size)
+                results.append((f"streaming, batch {batch_size}", loaded / elapsed))
+
+            cleanup()
+            loaded, elapsed = per_row_load(path)
+            results.append(("per-row db.add", loaded / elapsed))
+        finally:
+            cleanup()
+
+    print(f"\n{rows} rows")
+    for label, rate in results:
+        print(f"{label:<32} {rate:12,.0f} rows/sec")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+#Login throughput benchmark: fires concurrent logins at the app and, at the same time,
+#measures the latency of a cheap request to show whether hashing stalls the event loop.
+#Set BCRYPT_ROUNDS / PASSWORD_HASH_WORKERS in the environment to compare settings.
+#usage: python scripts/bench_login.py [logins] [concurrency]
+import sys
+import os
+import asyncio
+import statistics
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from main import app
+from database import Session_local
+from models import Users
+from routers.auth import bcrypt_context, BCRYPT_ROUNDS
+
+
+USERNAME = "bench-login"
+PASSWORD = "bench-password"
+
+
+
+def ensure_user():
+    db = Session_local()
+    bench_user = db.query(Users).filter(Users.username == USERNAME).first()
+    if not bench_user:
+        db.add(Users(username = USERNAME, hashed_password = bcrypt_context.hash(PASSWORD), role = "customer", is_active = True))
+    else:
+        bench_user.hashed_password = bcrypt_context.hash(PASSWORD)
+    db.commit()
+    db.close()
+
+
+async def main():
+    logins = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    ensure_user()
+
+    limit = asyncio.Semaphore(concurrency)
+    transport = httpx.ASGITransport(app = app)
+    probe_latencies = []
+    done = asyncio.Event()
+
+    async with httpx.AsyncClient(transport = transport, base_url = "http://bench") as client:
+        async def login():
+            async with limit:
+                response = await client.post("/login", data = {'username': USERNAME, 'password': PASSWORD})
+                return response.status_code == 200
+
+        async def probe():
+            while not done.is_set():
+                start = time.perf_counter()
+                await client.get("/")
+                probe_latencies.append(time.perf_counter() - start)
+                await asyncio.sleep(0.01)
+
+        probe_task = asyncio.create_task(probe())
+        start = time.perf_counter()
+        results = await asyncio.gather(*(login() for _ in range(logins)))
+        elapsed = time.perf_counter() - start
+        done.set()
+        await probe_task
+
+    probe_latencies.sort()
+    p95 = probe_latencies[int(len(probe_latencies) * 0.95) - 1] if probe_latencies else 0.0
+    print(f"bcrypt rounds={BCRYPT_ROUNDS}, {logins} logins, concurrency {concurrency}")
+    print(f"logins/sec            {sum(results) / elapsed:8.1f}  ({logins - sum(results)} failed)")
+    print(f"health check latency  median {statistics.median(probe_latencies) * 1000:.1f} ms, p95 {p95 * 1000:.1f} ms during the storm")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
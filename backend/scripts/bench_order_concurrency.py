@@ -0,0 +1,98 @@
+#Concurrency benchmark: fires N parallel orders at a single book and compares
+#the old read-modify-write path with the atomic conditional UPDATE path.
+#usage: python scripts/bench_order_concurrency.py [orders] [workers] [stock]
+import sys
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import HTTPException
+from database import Session_local
+from models import Books, Orders, Users
+from services.inventory import reserve_stock
+
+
+
+def legacy_order(book_id: int, user_id: int, quantity: int):
+    db = Session_local()
+    try:
+        required_book = db.query(Books).filter(Books.id == book_id).first()
+        if required_book.stock_quantity < quantity:
+            return False
+        db.add(Orders(book_id = book_id, quantity = quantity, user_id = user_id, price_at_purchase = required_book.price))
+        required_book.stock_quantity -= quantity
+        db.commit()
+        return True
+    except Exception:
+        db.rollback()
+        return False
+    finally:
+        db.close()
+
+
+def atomic_order(book_id: int, user_id: int, quantity: int):
+    db = Session_local()
+    try:
+        price = reserve_stock(db, book_id, quantity)
+        db.add(Orders(book_id = book_id, quantity = quantity, user_id = user_id, price_at_purchase = price))
+        db.commit()
+        return True
+    except HTTPException:
+        db.rollback()
+        return False
+    finally:
+        db.close()
+
+
+def run(name, place_order, n_orders: int, workers: int, stock: int, user_id: int):
+    db = Session_local()
+    book = Books(title = f"bench-{name}", author = "bench", domain = "bench", price = 100, stock_quantity = stock)
+    db.add(book)
+    db.commit()
+    book_id = book.id
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers = workers) as pool:
+        results = list(pool.map(lambda _: place_order(book_id, user_id, 1), range(n_orders)))
+    elapsed = time.perf_counter() - start
+
+    db.expire_all()
+    accepted = sum(results)
+    placed = db.query(Orders).filter(Orders.book_id == book_id).count()
+    final_stock = db.query(Books.stock_quantity).filter(Books.id == book_id).scalar()
+    oversold = max(0, placed - stock)
+    # orders whose decrement was overwritten by a concurrent writer
+    lost_updates = placed - (stock - final_stock)
+
+    print(f"{name:<8} orders/sec={n_orders / elapsed:8.1f}  accepted={accepted:<5} "
+          f"orders_rows={placed:<5} final_stock={final_stock:<5} oversold={oversold} lost_updates={lost_updates}")
+
+    db.query(Orders).filter(Orders.book_id == book_id).delete()
+    db.query(Books).filter(Books.id == book_id).delete()
+    db.commit()
+    db.close()
+
+
+def main():
+    n_orders = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else 32
+    stock = int(sys.argv[3]) if len(sys.argv) > 3 else n_orders // 2
+
+    db = Session_local()
+    bench_user = db.query(Users).filter(Users.username == "bench-user").first()
+    if not bench_user:
+        bench_user = Users(username = "bench-user", hashed_password = "!", role = "customer")
+        db.add(bench_user)
+        db.commit()
+    user_id = bench_user.id
+    db.close()
+
+    print(f"{n_orders} orders, {workers} workers, stock={stock}")
+    run("legacy", legacy_order, n_orders, workers, stock, user_id)
+    run("atomic", atomic_order, n_orders, workers, stock, user_id)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+#Search benchmark: seeds the books table up to N rows and compares the
+#original ILIKE '%x%' domain scan with the indexed ranked search.
+#Seeded books carry a "bench-" sku and are removed afterwards.
+#Run `alembic upgrade head` first so the search indexes exist.
+#usage: python scripts/bench_search.py [rows] [repeats]
+import sys
+import os
+import random
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import func, insert
+from database import Session_local
+from models import Books
+from services.search import ranked_search, ilike_search
+
+
+WORDS = ["data", "python", "learning", "deep", "history", "design", "systems", "network",
+         "finance", "poetry", "cooking", "physics", "biology", "music", "travel", "garden"]
+DOMAINS = ["AI", "Machine Learning", "Data Science", "Fiction", "History", "Finance", "Science", "Cooking"]
+# the words each match ~19% of the seeded titles, so LIMIT 20 lets the scan stop early while
+# the ranked search has to rank every match; a title number and an absent word are the
+# selective queries where the scan reads the whole table
+SEARCH_TERMS = ["physics", "garden", "learning", "poetry", "424242", "quantum"]
+
+
+
+def seed(db, rows: int, batch_size: int = 10000):
+    existing = db.query(func.count(Books.id)).scalar()
+    print(f"books table has {existing} rows, seeding up to {rows}")
+    rng = random.Random(42)
+
+    while existing < rows:
+        n = min(batch_size, rows - existing)
+        # the number keeps (title, author) unique, ux_books_title_author rejects repeats;
+        # the tag goes in the sku, which is not part of the searched document
+        db.execute(insert(Books), [{
+            'title': f"{' '.join(rng.sample(WORDS, 3)).title()} {existing + i + 1}",
+            'author': f"{rng.choice(WORDS).title()} {rng.choice(WORDS).title()}",
+            'domain': rng.choice(DOMAINS),
+            'price': rng.randint(100, 5000),
+            'stock_quantity': rng.randint(0, 100),
+            'sku': f"bench-{existing + i + 1}",
+        } for i in range(n)])
+        db.commit()
+        existing += n
+        print(f"  {existing} rows", end="\r")
+    print()
+
+    if db.get_bind().dialect.name == "postgresql":
+        db.connection().exec_driver_sql("ANALYZE books")
+        db.commit()
+
+
+def cleanup():
+    db = Session_local()
+    db.query(Books).filter(Books.sku.like("bench-%")).delete(synchronize_session = False)
+    db.commit()
+    db.close()
+
+
+def timed(label: str, fn, repeats: int):
+    fn()  # warm up
+    start = time.perf_counter()
+    for _ in range(repeats):
+        result = fn()
+    elapsed = (time.perf_counter() - start) / repeats
+    print(f"{label:<40} {elapsed * 1000:10.2f} ms   ({len(result)} rows)")
+    return elapsed
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    db = Session_local()
+    try:
+        seed(db, rows)
+
+        for term in SEARCH_TERMS:
+            scan = timed(f"ILIKE scan '%{term}%' (limit 20)", lambda: ilike_search(db, term, 20, 0), repeats)
+            ranked = timed(f"ranked search '{term}' (limit 20)", lambda: ranked_search(db, term, limit = 20), repeats)
+            print(f"{'speedup':<40} {scan / ranked:10.4g}x\n")
+    finally:
+        db.close()
+        cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+#Serialization benchmark: turns 10k ORM rows into a JSON response body the way
+#FastAPI does without a response model (jsonable_encoder + json.dumps), with orjson
+#rendering instead (the old ORJSONResponse), and through the response schemas
+#(pydantic validate + dump_json, what routes with response_model now do).
+#No database needed, rows are built in memory.
+#usage: python scripts/bench_serialization.py [rows] [repeats]
+import sys
+import os
+import json
+import time
+from datetime import datetime, timezone
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+from models import Books, Orders
+from schemas.book import BookResponse
+from schemas.order import OrderResponse
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+
+def make_rows(rows: int) -> dict:
+    now = datetime.now(timezone.utc)
+    return {
+        "books": (BookResponse, [Books(id = i, title = f"Title {i}", author = f"Author {i % 300}", domain = "ai", price = 100 + i % 900,
+                                       stock_quantity = i % 50, sku = f"SKU-{i}", stock_shards = 0, created_at = now) for i in range(rows)]),
+        "orders": (OrderResponse, [Orders(id = i, user_id = i % 500, book_id = i % 3000, quantity = 1 + i % 4, price_at_purchase = 250,
+                                          status = "PLACED", created_at = now) for i in range(rows)]),
+    }
+
+
+def best_of(func, repeats: int) -> float:
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    print(f"{rows} rows, best of {repeats}")
+    for name, (schema, objects) in make_rows(rows).items():
+        adapter = TypeAdapter(list[schema])
+        paths = {
+            "jsonable_encoder+json": lambda: json.dumps(jsonable_encoder(objects)).encode(),
+            "response schema": lambda: adapter.dump_json(adapter.validate_python(objects, from_attributes = True)),
+        }
+        if orjson is not None:
+            paths["jsonable_encoder+orjson"] = lambda: orjson.dumps(jsonable_encoder(objects))
+
+        baseline = None
+        for path, func in paths.items():
+            elapsed = best_of(func, repeats)
+            baseline = baseline or elapsed
+            print(f"{name:<8}{path:<26}{elapsed * 1000:9.1f} ms {rows / elapsed:>12,.0f} rows/sec  x{baseline / elapsed:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+#Startup benchmark: measures how long a fresh interpreter takes to import main.py
+#and appends the result to a CSV so startup latency can be tracked over time.
+#usage: python scripts/bench_startup.py [runs] [history_csv]
+import sys
+import os
+import csv
+import statistics
+import subprocess
+import time
+from datetime import datetime, timezone
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_SNIPPET = "import time; t = time.perf_counter(); import main; print(time.perf_counter() - t)"
+
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd = BACKEND_DIR,
+                              capture_output = True, text = True, check = True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def measure_once():
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, "-c", IMPORT_SNIPPET], cwd = BACKEND_DIR,
+                            capture_output = True, text = True)
+    wall = time.perf_counter() - start
+    if result.returncode != 0:
+        raise RuntimeError(f"importing main failed:\n{result.stderr}")
+    return float(result.stdout.strip().splitlines()[-1]), wall
+
+
+def slowest_imports(limit: int = 10):
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"], cwd = BACKEND_DIR,
+                            capture_output = True, text = True)
+    rows = []
+    for line in result.stderr.splitlines():
+        parts = line.split("|")
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        rows.append((int(parts[1]), parts[2].rstrip()))
+    rows.sort(reverse = True)
+    return rows[:limit]
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    history = sys.argv[2] if len(sys.argv) > 2 else os.path.join(BACKEND_DIR, "scripts", "startup_history.csv")
+
+    samples = [measure_once() for _ in range(runs)]
+    import_ms = statistics.median(sample[0] for sample in samples) * 1000
+    process_ms = statistics.median(sample[1] for sample in samples) * 1000
+
+    print(f"import main: median {import_ms:.1f} ms, full process: median {process_ms:.1f} ms ({runs} runs)")
+    print("slowest cumulative imports (us):")
+    for cumulative, name in slowest_imports():
+        print(f"  {cumulative:>10}  {name}")
+
+    new_file = not os.path.exists(history)
+    with open(history, "a", newline = "") as f:
+        writer = csv.writer(f)
+        if new_file:
+            writer.writerow(["timestamp", "revision", "runs", "import_ms", "process_ms"])
+        writer.writerow([datetime.now(timezone.utc).isoformat(timespec = "seconds"), git_revision(),
+                         runs, f"{import_ms:.1f}", f"{process_ms:.1f}"])
+    print(f"appended to {history}")
+
+
+if __name__ == "__main__":
+    main()
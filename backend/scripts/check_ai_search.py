@@ -0,0 +1,109 @@
+#Checks the AI search guard rails against a stub model, no LLM provider needed:
+#timeouts and provider errors trip the circuit breaker, a full house of LLM slots is
+#shed without touching the breaker, a cancelled half-open trial frees the breaker, a slow
+#first load of the provider is not an LLM timeout, the local rules only accept catalog
+#domains, and parse_query degrades so the route can fall back to keyword filters.
+#usage: python scripts/check_ai_search.py
+import sys
+import os
+import asyncio
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# small limits so every case runs in well under a second
+os.environ.update({"AI_SEARCH_TIMEOUT": "0.2", "AI_SEARCH_QUEUE_TIMEOUT": "0.05", "AI_SEARCH_MAX_CONCURRENCY": "2",
+                   "AI_SEARCH_BREAKER_FAILURES": "2", "AI_SEARCH_BREAKER_RESET": "0.3"})
+
+from services import ai_search
+from services.ai_search import AISearch, AISearchUnavailable, call_llm, parse_query, rule_parse, keyword_filters, breaker, parser_counts
+
+
+class StubModel:
+    """Answers with fixed filters after `delay` seconds, or raises `error`."""
+
+    def __init__(self, delay: float = 0.0, error: Exception | None = None):
+        self.delay = delay
+        self.error = error
+        self.calls = 0
+
+    async def ainvoke(self, inputs: dict) -> AISearch:
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.error:
+            raise self.error
+        return AISearch(domain = "ai", max_price = 500, sort_by = "price", order = "asc")
+
+
+def slow_provider() -> StubModel:
+    """Stands in for the first import of the LangChain stack, slower than AI_SEARCH_TIMEOUT."""
+    import time
+    time.sleep(0.4)
+    return StubModel()
+
+
+async def unavailable(query: str, model: StubModel) -> str:
+    try:
+        await call_llm(query, model)
+    except AISearchUnavailable as e:
+        return str(e)
+    raise AssertionError("expected AISearchUnavailable")
+
+
+async def main():
+    filters = await call_llm("something about ai", StubModel())
+    assert filters.domain == "ai" and breaker.state == "closed"
+    print("stub answer parsed, circuit closed")
+
+    # two slow calls hold both slots, the third waits past the queue timeout and is shed
+    slow = StubModel(delay = 0.15)
+    results = await asyncio.gather(call_llm("a", slow), call_llm("b", slow), unavailable("c", slow))
+    assert results[2] == "AI search is at capacity" and slow.calls == 2
+    assert parser_counts['shed'] == 1 and breaker.failures == 0 and parser_counts['llm_timeouts'] == 0
+    print("full house shed, breaker untouched")
+
+    hanging = StubModel(delay = 1.0)
+    assert await unavailable("d", hanging) == "AI search timed out"
+    assert await unavailable("e", StubModel(error = RuntimeError("provider down"))) == "AI parsing failed: provider down"
+    assert breaker.state == "open" and parser_counts['llm_timeouts'] == 1 and parser_counts['llm_failures'] == 1
+    assert await unavailable("f", hanging) == "AI search circuit is open" and hanging.calls == 1
+    print("timeout and provider error opened the circuit")
+
+    # a cancelled half-open trial must not leave the breaker waiting on it
+    await asyncio.sleep(breaker.reset_timeout)
+    trial = asyncio.create_task(call_llm("g", hanging))
+    await asyncio.sleep(0.05)
+    trial.cancel()
+    await asyncio.gather(trial, return_exceptions = True)
+    assert breaker.state == "half-open" and not breaker.trial_running
+    await call_llm("h", StubModel())
+    assert breaker.state == "closed"
+    print("cancelled trial released, next trial closed the circuit")
+
+    ai_search.set_provider(None)
+    ai_search.PROVIDER_FACTORY = "__main__:slow_provider"
+    filters = await call_llm("i")
+    assert filters.domain == "ai" and breaker.state == "closed" and breaker.failures == 0
+    assert parser_counts['llm_timeouts'] == 1 and ai_search.ai_search_stats()['provider_loaded']
+    print("slow provider load is not a timeout")
+
+    domains = ["AI", "History", "Machine Learning"]
+    assert rule_parse("ai books under 500", domains) == AISearch(domain = "AI", max_price = 500, sort_by = None, order = None)
+    assert rule_parse("books on machine learning", domains).domain == "Machine Learning"
+    assert rule_parse("cheapest books", domains).domain is None
+    for query in ("books on sale", "books for kids under 10", "harry potter books"):
+        assert rule_parse(query, domains) is None, query
+    print("rules only take catalog domains")
+
+    breaker.opened_at, breaker.failures = 0.0, breaker.failure_threshold
+    breaker.reset_timeout = 3600
+    filters, degraded = await parse_query("recommend something cerebral about ai", StubModel())
+    assert filters is None and degraded
+    fallback = keyword_filters("recommend something cerebral about ai under 300", ["AI", "History"])
+    assert fallback.domain == "AI" and fallback.max_price == 300
+    print("open circuit degrades to keyword filters")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
+    print(ai_search.ai_search_stats()['parser'])
+    print("OK")
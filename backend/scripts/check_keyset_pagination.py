@@ -0,0 +1,80 @@
+#Round-trip check of the order history cursor: seeds orders whose created_at share one
+#second, some from the server default (no fractional seconds on sqlite) and some bound
+#from Python (microseconds), then walks /orders/get-my-orders page by page and fails
+#unless every order comes back exactly once.
+#usage: python scripts/check_keyset_pagination.py [orders] [page_size]
+import sys
+import os
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from main import app
+from database import Session_local
+from models import Orders, Users, Books
+from routers.auth import create_access_token
+
+
+def seed(orders: int):
+    db = Session_local()
+    user = Users(username = f"keyset-check-{os.getpid()}", hashed_password = "!", role = "customer")
+    book = Books(title = f"keyset-check-{os.getpid()}", author = "keyset-check", domain = "check", price = 100, stock_quantity = 0)
+    db.add_all([user, book])
+    db.flush()
+    now = datetime.now(timezone.utc).replace(microsecond = 0)
+    db.add_all([Orders(user_id = user.id, book_id = book.id, quantity = 1, price_at_purchase = 100,
+                       # every other order gets an explicit timestamp inside the same second
+                       created_at = now + timedelta(microseconds = n) if n % 2 else None)
+                for n in range(orders)])
+    db.commit()
+    user_id, book_id, username = user.id, book.id, user.username
+    db.close()
+    return user_id, book_id, username
+
+
+def cleanup(user_id: int, book_id: int):
+    db = Session_local()
+    db.query(Orders).filter(Orders.user_id == user_id).delete()
+    db.query(Books).filter(Books.id == book_id).delete()
+    db.query(Users).filter(Users.id == user_id).delete()
+    db.commit()
+    db.close()
+
+
+async def walk(username: str, user_id: int, page_size: int, max_pages: int) -> tuple:
+    token = create_access_token(username, user_id, timedelta(minutes = 5), role = "customer")
+    transport = httpx.ASGITransport(app = app)
+    seen, pages, cursor = [], 0, None
+    async with httpx.AsyncClient(transport = transport, base_url = "http://check",
+                                 headers = {"Authorization": f"Bearer {token}"}) as client:
+        while True:
+            params = {"limit": page_size} | ({"cursor": cursor} if cursor else {})
+            response = await client.get("/orders/get-my-orders", params = params)
+            response.raise_for_status()
+            page = response.json()
+            pages += 1
+            seen.extend(order['id'] for order in page['items'])
+            cursor = page['next_cursor']
+            # a cursor that doesn't advance would loop forever
+            if not cursor or pages >= max_pages:
+                return seen, pages
+
+
+if __name__ == "__main__":
+    orders = int(sys.argv[1]) if len(sys.argv) > 1 else 25
+    page_size = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    if orders <= page_size:
+        sys.exit("orders must be larger than page_size to span two pages")
+
+    user_id, book_id, username = seed(orders)
+    try:
+        seen, pages = asyncio.run(walk(username, user_id, page_size, orders // page_size + 2))
+    finally:
+        cleanup(user_id, book_id)
+
+    print(f"{orders} orders, page size {page_size}: {len(seen)} returned over {pages} pages")
+    if len(seen) != orders or len(set(seen)) != orders:
+        sys.exit(f"FAIL: expected {orders} distinct orders, got {len(set(seen))} distinct of {len(seen)}")
+    print("OK")
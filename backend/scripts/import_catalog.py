@@ -0,0 +1,43 @@
+#Bulk catalog import: upserts books from a CSV (with a header row) or NDJSON file,
+#matching existing books on title+author or on sku. Each batch is committed on its
+#own, so an interrupted import can simply be run again.
+#usage: python scripts/import_catalog.py catalog.csv [--format csv|ndjson] [--key title_author|sku] [--batch-size 1000]
+import sys
+import os
+import argparse
+import json
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import Session_local
+from services.catalog_import import import_lines, FORMATS, KEYS
+
+
+
+def main():
+    parser = argparse.ArgumentParser(description = "Bulk import books into the catalog.")
+    parser.add_argument("file")
+    parser.add_argument("--format", choices = FORMATS, help = "defaults to the file extension")
+    parser.add_argument("--key", choices = list(KEYS), default = "title_author")
+    parser.add_argument("--batch-size", type = int, default = 1000)
+    args = parser.parse_args()
+
+    import_format = args.format or ("ndjson" if args.file.endswith((".ndjson", ".jsonl")) else "csv")
+    db = Session_local()
+    start = time.perf_counter()
+    try:
+        with open(args.file, newline = "", encoding = "utf-8") as f:
+            report = import_lines(db, f, import_format, args.key, args.batch_size)
+    finally:
+        db.close()
+    elapsed = time.perf_counter() - start
+
+    for error in report['errors']:
+        print(f"line {error['line']}: {error['error']}")
+    print(json.dumps({key: value for key, value in report.items() if key != 'errors'}))
+    print(f"{report['rows']} rows in {elapsed:.2f}s ({report['rows'] / elapsed:,.0f} rows/sec)")
+
+
+if __name__ == "__main__":
+    main()
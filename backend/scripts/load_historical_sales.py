@@ -1,46 +1,99 @@
 #ETL script to load the data in postgres database
+#Streams the CSV in chunks into a staging table (COPY on postgres, batched inserts
+#elsewhere) and merges daily totals into historical_sales keyed on (domain, sale_date),
+#so re-running a file or loading an overlapping one is safe.
+#usage: python scripts/load_historical_sales.py [--file cleaned_sales.csv] [--batch-size 50000]
 import sys
 import os
+import argparse
+import io
+import time
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 import pandas as pd
+from sqlalchemy import text
 from sqlalchemy.orm import Session 
 from database import Session_local
-from models import HistoricalSales
 
 
+DEFAULT_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cleaned_sales.csv')
 
-def load_data():
-    print("Starting historical sales load.....")
-    df = pd.read_csv('cleaned_sales.csv')
-    df["sale_date"] = pd.to_datetime(df["sale_date"]).dt.date
+STAGING_TABLE = "historical_sales_staging"
 
-    db: Session = Session_local()
+MERGE_SQL = f"""
+    INSERT INTO historical_sales (domain, sale_date, quantity)
+    SELECT domain, sale_date, SUM(quantity) FROM {STAGING_TABLE} WHERE true
+    GROUP BY domain, sale_date
+    ON CONFLICT (domain, sale_date) DO UPDATE SET quantity = excluded.quantity
+"""
+
+
+
+def create_staging(db: Session):
+    db.execute(text(f"DROP TABLE IF EXISTS {STAGING_TABLE}"))
+    db.execute(text(f"CREATE TEMPORARY TABLE {STAGING_TABLE} (sale_date DATE NOT NULL, domain VARCHAR NOT NULL, quantity INTEGER NOT NULL)"))
 
-    if db.query(HistoricalSales).first():
-        print("historical_sales already contains data. Skipping load.")
-        return
+
+def stage_chunk(db: Session, chunk: pd.DataFrame):
+    if db.get_bind().dialect.name == "postgresql":
+        buffer = io.StringIO()
+        chunk[["sale_date", "domain", "quantity"]].to_csv(buffer, index = False, header = False)
+        buffer.seek(0)
+        cursor = db.connection().connection.cursor()
+        cursor.copy_expert(f"COPY {STAGING_TABLE} (sale_date, domain, quantity) FROM STDIN WITH (FORMAT csv)", buffer)
+        cursor.close()
+    else:
+        db.execute(text(f"INSERT INTO {STAGING_TABLE} (sale_date, domain, quantity) VALUES (:sale_date, :domain, :quantity)"),
+                   chunk[["sale_date", "domain", "quantity"]].to_dict("records"))
+
+
+def load_data(path: str = DEFAULT_FILE, batch_size: int = 50000):
+    print("Starting historical sales load.....")
+    db: Session = Session_local()
+    start = time.perf_counter()
+    rows = 0
 
     try:
-        for row in df.itertuples(index=False):
-            record = HistoricalSales(
-                domain = row.domain,
-                quantity = int(row.quantity),
-                sale_date = row.sale_date)
-            
-            db.add(record)
-        
+        create_staging(db)
+
+        for chunk in pd.read_csv(path, chunksize = batch_size, usecols = ["sale_date", "domain", "quantity"]):
+            chunk = chunk.dropna(subset = ["sale_date", "domain", "quantity"])
+            chunk["sale_date"] = pd.to_datetime(chunk["sale_date"]).dt.date
+            chunk["quantity"] = chunk["quantity"].astype(int)
+            stage_chunk(db, chunk)
+
+            rows += len(chunk)
+            elapsed = time.perf_counter() - start
+            print(f"  staged {rows} rows ({rows / elapsed:,.0f} rows/sec)", end = "\r", flush = True)
+
+        print()
+        merged = db.execute(text(MERGE_SQL)).rowcount
+        db.execute(text(f"DROP TABLE IF EXISTS {STAGING_TABLE}"))
         db.commit()
-        print("Historical data loaded successfully")
+
+        elapsed = time.perf_counter() - start
+        print(f"Historical data loaded successfully: {rows} rows -> {merged} daily (domain, sale_date) totals "
+              f"in {elapsed:.2f}s ({rows / elapsed:,.0f} rows/sec)")
+        return rows, elapsed
 
     except Exception as e:
         db.rollback()
         print("Error: ", e)
+        raise
 
     
     finally:
         db.close()
     
+
+def parse_args():
+    arg_parser = argparse.ArgumentParser(description = "Load historical sales into the historical_sales table.")
+    arg_parser.add_argument("--file", default = DEFAULT_FILE, help = "CSV with sale_date, domain and quantity columns")
+    arg_parser.add_argument("--batch-size", type = int, default = 50000, help = "rows read and staged per chunk")
+    return arg_parser.parse_args()
+
+
 if __name__ == "__main__":
-    load_data()
\ No newline at end of file
+    args = parse_args()
+    load_data(args.file, args.batch_size)
@@ -0,0 +1,60 @@
+#Training script: fits the weekly demand forecasting models from the demand rollup
+#(run scripts/backfill_demand_rollup.py first) and stores them as a new model version.
+#--scaling also reports training time against the number of domains.
+#usage: python scripts/train_forecast.py [--workers N] [--scaling]
+import sys
+import os
+import argparse
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+from sqlalchemy.orm import Session
+from database import Session_local
+from services.rollup import demand_query
+from services.forecasting import train_models, save_models
+
+
+
+def load_demand(db: Session) -> pd.DataFrame:
+    rows = db.execute(demand_query("week")).mappings().all()
+    return pd.DataFrame(rows, columns = ["domain", "book_id", "period_start", "quantity", "revenue"])
+
+
+def scaling_report(demand: pd.DataFrame, workers: int | None):
+    domains = sorted(demand["domain"].unique())
+    counts = sorted({min(n, len(domains)) for n in [1, 2, 4, 8, 16, 32, 64, len(domains)]})
+
+    print(f"{'domains':>8} {'rows':>8} {'features s':>11} {'total s':>9}")
+    for count in counts:
+        subset = demand[demand["domain"].isin(domains[:count])]
+        _, stats = train_models(subset, workers)
+        print(f"{count:>8} {stats['rows']:>8} {stats['feature_seconds']:>11.3f} {stats['total_seconds']:>9.3f}")
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description = "Train the weekly demand forecasting models.")
+    arg_parser.add_argument("--workers", type = int, default = None, help = "training processes (default: CPU count)")
+    arg_parser.add_argument("--scaling", action = "store_true", help = "report training time vs number of domains")
+    args = arg_parser.parse_args()
+
+    db: Session = Session_local()
+    try:
+        demand = load_demand(db)
+    finally:
+        db.close()
+
+    if demand.empty:
+        print("demand_rollups is empty, run scripts/backfill_demand_rollup.py first")
+        return
+
+    if args.scaling:
+        scaling_report(demand, args.workers)
+
+    models, stats = train_models(demand, args.workers)
+    version = save_models(models, stats)
+    print(f"Trained {stats['domains']} domain models on {stats['rows']} weeks in {stats['total_seconds']}s, version {version}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,16 @@
 from pydantic import BaseModel, Field
-from typing import Optional, Literal
-from langchain_core.prompts import PromptTemplate
-from langchain_core.output_parsers import PydanticOutputParser
-from langchain_google_genai import ChatGoogleGenerativeAI
+from typing import Optional, Literal, Protocol
 from dotenv import load_dotenv
+from services.cache import TTLCache
+import asyncio
+import importlib
+import os
+import re
+import threading
+import time
 
 load_dotenv()
 
-model = ChatGoogleGenerativeAI(model="gemini-3-flash-preview", response_mime_type="application/json", temperature = 0)
-
 
 class AISearch(BaseModel):
     domain: Optional[str] = Field(description="Enter the domain of the book.")
@@ -18,35 +20,296 @@ class AISearch(BaseModel):
     order: Optional[Literal["asc", "desc"]] = Field(description="Sorting order: ascending or descending")
 
 
-parser = PydanticOutputParser(pydantic_object = AISearch)
+class QueryParserProvider(Protocol):
+    """Anything that turns {"query": text} into AISearch filters, e.g. a LangChain runnable."""
+
+    async def ainvoke(self, inputs: dict) -> AISearch: ...
+
+
+# "module:factory" building the provider, imported on first use so that langchain
+# and the model client stay out of application startup
+PROVIDER_FACTORY = os.getenv("AI_SEARCH_PROVIDER", "services.gemini_provider:create_provider")
+
+_provider = None
+_provider_lock = threading.Lock()
+
+
+def get_provider() -> QueryParserProvider:
+    global _provider
+    if _provider is None:
+        with _provider_lock:
+            if _provider is None:
+                module_name, factory = PROVIDER_FACTORY.split(":")
+                _provider = getattr(importlib.import_module(module_name), factory)()
+    return _provider
+
+
+def set_provider(provider: QueryParserProvider | None):
+    """Swap the provider, e.g. for a stub model; None makes the next call load the default again."""
+    global _provider
+    with _provider_lock:
+        _provider = provider
+
+
+def preload_provider():
+    """Build the provider on a background thread so the first AI search doesn't pay for it."""
+    def load():
+        try:
+            get_provider()
+        except Exception as e:
+            print("AI search provider preload failed:", e)
+
+    thread = threading.Thread(target = load, name = "ai-search-preload", daemon = True)
+    thread.start()
+    return thread
+
+
+
+# normalized query text -> parsed AISearch filters
+query_cache = TTLCache(maxsize = int(os.getenv("AI_SEARCH_CACHE_SIZE", "1024")),
+                       ttl = float(os.getenv("AI_SEARCH_CACHE_TTL", "3600")))
+
+parser_counts = {'rule_hits': 0, 'llm_calls': 0, 'llm_failures': 0, 'llm_timeouts': 0, 'provider_errors': 0, 'shed': 0, 'degraded': 0}
+_counts_lock = threading.Lock()
+
+
+def _count(name: str):
+    with _counts_lock:
+        parser_counts[name] += 1
+
+
+def normalize_query(query: str) -> str:
+    query = re.sub(r"[?!.,]+", " ", query.lower())
+    return " ".join(query.split())
+
+
+PRICE_PATTERN = re.compile(r"\b(?:under|below|less than|cheaper than|up to|upto|within|max(?:imum)?|at most|budget(?: of)?)\s+(?:rs\.?\s*|inr\s*|\$)?(\d+)\b")
+
+SORT_PATTERNS = [
+    (re.compile(r"\b(?:sorted|sort|ordered|order)\s+by\s+(price|title|name|date|id)(?:\s+(asc|ascending|desc|descending|low to high|high to low))?\b"), None),
+    (re.compile(r"\b(?:cheapest|lowest price)(?: first)?\b"), ("price", "asc")),
+    (re.compile(r"\b(?:most expensive|highest price|priciest)(?: first)?\b"), ("price", "desc")),
+    (re.compile(r"\b(?:newest|latest|most recent)(?: first)?\b"), ("created_at", "desc")),
+    (re.compile(r"\boldest(?: first)?\b"), ("created_at", "asc")),
+]
+
+VAGUE_WORDS = {"good", "best", "top", "cheap", "affordable", "expensive", "popular", "new", "old", "recent",
+               "not", "no", "without", "except", "by", "and", "or", "like", "similar"}
+
+SORT_FIELDS = {"price": "price", "title": "title", "name": "title", "date": "created_at", "id": "id"}
+
+DOMAIN_PATTERN = re.compile(
+    r"^(?:(?:show|find|get|list|give|search)(?: me)?\s+)?(?:(?:all|some|the|any)\s+)?"
+    r"(?:(?P<before>[\w+#\- ]+?)\s+books?|books?(?:\s+(?:on|about|in|for)\s+(?P<after>[\w+#\- ]+?))?)$")
+
+
+def extract_price_and_sort(text: str):
+    """Pull a budget and a sort clause out of the text, returning what is left of it."""
+    max_price = None
+    sort_by = None
+    order = None
+
+    match = PRICE_PATTERN.search(text)
+    if match:
+        max_price = int(match.group(1))
+        text = text[:match.start()] + " " + text[match.end():]
+
+    for pattern, fixed in SORT_PATTERNS:
+        match = pattern.search(text)
+        if not match:
+            continue
+        if fixed:
+            sort_by, order = fixed
+        else:
+            sort_by = SORT_FIELDS[match.group(1)]
+            direction = match.group(2) or "asc"
+            order = "desc" if direction in ("desc", "descending", "high to low") else "asc"
+        text = text[:match.start()] + " " + text[match.end():]
+        break
+
+    return " ".join(text.split()), max_price, sort_by, order
+
+
+def rule_parse(query: str, domains = ()):
+    """Parse simple phrasings like "ai books under 500 sorted by price desc" without the LLM.
+
+    The phrase in front of or after "books" is only taken as the domain when it names
+    one of the catalog `domains` ("books on sale" and "harry potter books" don't).
+    Returns None as soon as any part of the query is not understood.
+    """
+    text, max_price, sort_by, order = extract_price_and_sort(query)
+
+    match = DOMAIN_PATTERN.match(text)
+    if not match:
+        return None
+
+    domain = match.group("before") or match.group("after")
+    if domain:
+        if len(domain.split()) > 3 or VAGUE_WORDS.intersection(domain.split()):
+            # "good", "cheap", "not" etc. need real understanding, leave them to the LLM
+            return None
+        known = {known_domain.lower(): known_domain for known_domain in domains if known_domain}
+        domain = known.get(domain.strip())
+        if domain is None:
+            return None
+    return AISearch(domain = domain, max_price = max_price, sort_by = sort_by, order = order)
+
+
+def keyword_filters(query: str, domains = ()) -> AISearch:
+    """Best-effort filters used when the LLM is unavailable.
+
+    Keeps the budget and sort clauses the rules understand and picks the longest
+    known catalog domain mentioned in the query, if any.
+    """
+    text, max_price, sort_by, order = extract_price_and_sort(normalize_query(query))
+    padded = f" {text} "
+    mentioned = [domain for domain in domains if domain and f" {domain.lower()} " in padded]
+    domain = max(mentioned, key = len) if mentioned else None
+    return AISearch(domain = domain, max_price = max_price, sort_by = sort_by, order = order)
+
+
+class CircuitBreaker:
+    """Stops calling the LLM after `failure_threshold` consecutive failures.
+
+    After `reset_timeout` seconds one trial call is let through (half-open); its
+    outcome closes the breaker again or re-opens it for another period.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half-open" and not self.trial_running:
+                self.trial_running = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.trial_running or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self.trial_running = False
+
+    def release_trial(self):
+        """Free the half-open trial of a call that ended without an outcome, e.g. was cancelled."""
+        with self._lock:
+            self.trial_running = False
+
+
+class AISearchUnavailable(Exception):
+    pass
+
+
+LLM_TIMEOUT = float(os.getenv("AI_SEARCH_TIMEOUT", "5"))
+
+# how long a query may wait for a free LLM slot before it is shed to the keyword fallback
+QUEUE_TIMEOUT = float(os.getenv("AI_SEARCH_QUEUE_TIMEOUT", "1"))
+
+breaker = CircuitBreaker(failure_threshold = int(os.getenv("AI_SEARCH_BREAKER_FAILURES", "5")),
+                         reset_timeout = float(os.getenv("AI_SEARCH_BREAKER_RESET", "30")))
+
+# caps LLM calls in flight per worker, so a slow provider can't take every request with it
+llm_slots = asyncio.Semaphore(int(os.getenv("AI_SEARCH_MAX_CONCURRENCY", "8")))
+
 
-template = PromptTemplate(
-    template = """
-You are an assistant that extracts structured filters from a user's natural language query
-for a book inventory and order system.
+async def call_llm(query: str, runnable: QueryParserProvider | None = None) -> AISearch:
+    """Run one query through the provider.
 
-User query:
-"{query}"
+    Waiting for a slot is not part of LLM_TIMEOUT and never counts against the
+    breaker: a full house means this worker is busy, not that the provider is failing.
+    """
+    try:
+        await asyncio.wait_for(llm_slots.acquire(), timeout = QUEUE_TIMEOUT)
+    except asyncio.TimeoutError as e:
+        _count('shed')
+        raise AISearchUnavailable("AI search is at capacity") from e
 
-Your task:
-- Extract relevant filters from the query.
-- If a field is not mentioned, return null.
-- Do NOT invent values.
-- Return ONLY valid JSON.
-- The JSON must strictly follow the schema below.
+    try:
+        # a cold load of the provider stack can take seconds: it happens under the slot
+        # but before the timed call, so it is neither an LLM timeout nor a breaker failure
+        try:
+            provider = runnable or _provider or await asyncio.to_thread(get_provider)
+        except Exception as e:
+            _count('provider_errors')
+            raise AISearchUnavailable(f"AI search provider failed to load: {e}") from e
 
-{format_instructions}
+        if not breaker.allow():
+            raise AISearchUnavailable("AI search circuit is open")
 
-""",
-    input_variables=['query'],
-    partial_variables = {'format_instructions':parser.get_format_instructions()}
-)
+        _count('llm_calls')
+        try:
+            filters = await asyncio.wait_for(provider.ainvoke({"query": query}), timeout = LLM_TIMEOUT)
+        except asyncio.TimeoutError as e:
+            _count('llm_timeouts')
+            breaker.record_failure()
+            raise AISearchUnavailable("AI search timed out") from e
+        except Exception as e:
+            _count('llm_failures')
+            breaker.record_failure()
+            raise AISearchUnavailable(f"AI parsing failed: {e}") from e
+        finally:
+            # CancelledError is no Exception: a cancelled trial would otherwise hold the breaker half-open forever
+            breaker.release_trial()
 
+        breaker.record_success()
+        return filters
+    finally:
+        llm_slots.release()
 
-chain = template | model | parser
 
+async def parse_query(query: str, runnable: QueryParserProvider | None = None, domains = ()):
+    """Parse a query into filters: memo first, then the local rules, then the LLM.
 
+    `domains` are the catalog's domains, the only ones the local rules accept.
+    Returns (filters, degraded). When the LLM times out, fails or its circuit is open
+    this returns (None, True) and the caller falls back to keyword_filters().
+    """
+    key = normalize_query(query)
+    filters = query_cache.get(key)
+    if filters is not None:
+        return filters, False
 
+    filters = rule_parse(key, domains)
+    if filters is not None:
+        _count('rule_hits')
+    else:
+        try:
+            filters = await call_llm(query, runnable)
+        except AISearchUnavailable:
+            _count('degraded')
+            return None, True
 
+    query_cache.set(key, filters)
+    return filters, False
 
 
+def ai_search_stats() -> dict:
+    with _counts_lock:
+        counts = dict(parser_counts)
+    parsed = counts['rule_hits'] + counts['llm_calls']
+    counts['rule_hit_rate'] = round(counts['rule_hits'] / parsed, 4) if parsed else 0.0
+    return {'query_cache': query_cache.stats(), 'parser': counts, 'circuit': breaker.state, 'provider_loaded': _provider is not None}
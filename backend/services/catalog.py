@@ -0,0 +1,159 @@
+import os
+import time
+from datetime import datetime, timezone
+from sqlalchemy import func, text, select, update, insert
+from models import Books, CatalogState, utc_now
+from services.cache import TTLCache
+from services.conditional import as_utc
+
+
+# filtered catalog totals, keyed by the normalized filter set
+count_cache = TTLCache(maxsize = int(os.getenv("CATALOG_COUNT_CACHE_SIZE", "256")),
+                       ttl = float(os.getenv("CATALOG_COUNT_CACHE_TTL", "30")))
+
+# serialized single-book records served by GET /public/{book_id}
+book_cache = TTLCache(maxsize = int(os.getenv("BOOK_CACHE_SIZE", "4096")),
+                      ttl = float(os.getenv("BOOK_CACHE_TTL", "300")))
+
+# above this many rows an unfiltered total is read from the planner statistics
+# instead of counted (postgres only, 0 disables the estimate)
+COUNT_ESTIMATE_THRESHOLD = int(os.getenv("CATALOG_COUNT_ESTIMATE_THRESHOLD", "0"))
+
+# longest time a conditional GET may keep answering 304 over stock changed by orders
+STOCK_WINDOW = max(float(os.getenv("CATALOG_STOCK_WINDOW", "30")), 1.0)
+
+
+# the columns list endpoints return, read as plain row mappings without building ORM objects
+BOOK_COLUMNS = (Books.id, Books.title, Books.author, Books.domain, Books.price,
+                Books.stock_quantity, Books.sku, Books.created_at, Books.updated_at)
+
+
+def book_rows():
+    return select(*BOOK_COLUMNS)
+
+
+def fetch_books(db, query) -> list:
+    """Run a book_rows() query and return plain dicts, which response models validate fastest."""
+    return [dict(row) for row in db.execute(query).mappings()]
+
+
+def normalize_filters(domain: str | None, max_price: int | None):
+    domain = domain.strip().lower() if domain else None
+    return (domain or None, max_price)
+
+
+def book_filters(domain: str | None, max_price: int | None):
+    """Predicates shared by every catalog listing, so the page and its total always agree."""
+    filters = []
+    domain = domain.strip() if domain else None
+    if domain:
+        filters.append(Books.domain.ilike(f"%{domain}%"))
+    if max_price is not None:
+        filters.append(Books.price <= max_price)
+    return filters
+
+
+def estimated_book_count(db):
+    if COUNT_ESTIMATE_THRESHOLD <= 0 or db.get_bind().dialect.name != "postgresql":
+        return None
+    estimate = db.execute(text("SELECT reltuples::bigint FROM pg_class WHERE oid = 'books'::regclass")).scalar()
+    if estimate is None or estimate < COUNT_ESTIMATE_THRESHOLD:
+        return None
+    return int(estimate)
+
+
+def count_books(db, domain: str | None = None, max_price: int | None = None, version: int | None = None) -> int:
+    """Total number of books matching the filters, memoized per catalog version."""
+    if version is None:
+        version = catalog_state(db)[0]
+    filters = normalize_filters(domain, max_price)
+    key = (version,) + filters
+    total = count_cache.get(key)
+    if total is not None:
+        return total
+
+    total = None
+    if filters == (None, None):
+        total = estimated_book_count(db)
+    if total is None:
+        total = db.query(func.count(Books.id)).filter(*book_filters(*filters)).scalar()
+
+    count_cache.set(key, total)
+    return total
+
+
+def known_domains(db, version: int | None = None) -> list:
+    """Distinct book domains, memoized per catalog version like the totals."""
+    if version is None:
+        version = catalog_state(db)[0]
+    key = (version, 'domains')
+    domains = count_cache.get(key)
+    if domains is None:
+        domains = [domain for (domain,) in db.query(Books.domain).distinct() if domain]
+        count_cache.set(key, domains)
+    return domains
+
+
+def catalog_state(db) -> tuple:
+    """(version, last changed) of the catalog, a primary-key read of catalog_state.
+
+    Every admin write to books bumps the version in its own transaction, so all
+    processes see the same state. Orders don't: one row bumped by every order
+    would serialize them all, their stock changes are covered by stock_window().
+    """
+    row = db.execute(select(CatalogState.version, CatalogState.changed_at).where(CatalogState.id == 1)).first()
+    return (row.version, row.changed_at) if row else (0, None)
+
+
+def bump_catalog_version(db):
+    """Mark the catalog as changed, in the transaction of the admin write that changed it."""
+    changed = update(CatalogState).where(CatalogState.id == 1).values(version = CatalogState.version + 1, changed_at = utc_now())
+    if not db.execute(changed).rowcount:
+        db.execute(insert(CatalogState).values(id = 1, version = 1, changed_at = utc_now()))
+
+
+def stock_window() -> datetime:
+    """Start of the current stock window; validators roll over with it so stock sold
+    by orders is never served as unchanged for longer than STOCK_WINDOW seconds."""
+    now = time.time()
+    return datetime.fromtimestamp(now - now % STOCK_WINDOW, timezone.utc)
+
+
+def last_modified(changed_at: datetime | None, window: datetime) -> datetime:
+    """Last-Modified of a catalog response: its last admin change, or the stock window when later."""
+    return max(as_utc(changed_at), window) if changed_at else window
+
+
+def serialize_book(book) -> dict:
+    return {column.key: getattr(book, column.key) for column in Books.__table__.columns}
+
+
+def get_cached_book(db, book_id: int):
+    """Read-through lookup of a single book, returns None when it does not exist."""
+    book = book_cache.get(book_id)
+    if book is not None:
+        return book
+
+    book_model = db.query(Books).filter(Books.id == book_id).first()
+    if not book_model:
+        return None
+
+    book = serialize_book(book_model)
+    book_cache.set(book_id, book)
+    return book
+
+
+def invalidate_book(*book_ids: int):
+    """Drop cached records of books whose row was changed, e.g. by an order touching its stock."""
+    for book_id in book_ids:
+        book_cache.pop(book_id)
+
+
+def invalidate_catalog(*book_ids: int):
+    """Called by every admin write to the books table."""
+    count_cache.clear()
+    invalidate_book(*book_ids)
+
+
+def cache_stats() -> dict:
+    return {'book_cache': book_cache.stats(), 'count_cache': count_cache.stats()}
@@ -0,0 +1,257 @@
+import codecs
+import csv
+import json
+from pydantic import ValidationError
+from sqlalchemy import func, select, insert, update, tuple_, case
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.dialects import postgresql, sqlite
+from models import Books, utc_now
+from schemas.book import Book
+from services.catalog import invalidate_catalog, bump_catalog_version
+from services.inventory import rebalance_shards
+
+
+FORMATS = ("csv", "ndjson")
+
+# conflict target of the upsert: the unique index each natural key maps to
+KEYS = {
+    "title_author": ["title", "author"],
+    "sku": ["sku"],
+}
+
+UPSERT_FIELDS = ["title", "author", "domain", "price", "stock_quantity", "sku"]
+
+# only the first errors are returned, the count covers all of them
+MAX_REPORTED_ERRORS = 1000
+
+
+class RowParser:
+    """Turns input lines into (line number, record) pairs, one line at a time.
+
+    Fed line by line so the CLI can read a file and the endpoint a request body
+    without either holding the whole input. Records that can't be parsed come
+    back as (line number, error message).
+    """
+
+    def __init__(self, import_format: str):
+        if import_format not in FORMATS:
+            raise ValueError(f"unknown import format {import_format}")
+        self.format = import_format
+        self.line_no = 0
+        self.header = None
+        self.pending = ""
+        self.pending_start = 0
+
+    def feed(self, line: str) -> list:
+        self.line_no += 1
+        if self.line_no == 1:
+            # Excel and most supplier exports start the file with a UTF-8 BOM
+            line = line.removeprefix("\ufeff")
+        if self.format == "ndjson":
+            if not line.strip():
+                return []
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                return [(self.line_no, f"invalid JSON: {e}")]
+            if not isinstance(record, dict):
+                return [(self.line_no, "expected a JSON object")]
+            return [(self.line_no, record)]
+
+        # a quoted CSV field may span lines, wait for the closing quote
+        if not self.pending:
+            self.pending_start = self.line_no
+        self.pending += line
+        if self.pending.count('"') % 2:
+            return []
+        text, self.pending = self.pending, ""
+        if not text.strip():
+            return []
+        values = next(csv.reader([text]))
+        if self.header is None:
+            self.header = [name.strip() for name in values]
+            return []
+        if len(values) != len(self.header):
+            return [(self.pending_start, f"expected {len(self.header)} columns, got {len(values)}")]
+        # empty CSV cells mean "not given", e.g. a row without a sku
+        return [(self.pending_start, {name: value for name, value in zip(self.header, values) if value != ""})]
+
+    def close(self) -> list:
+        if self.pending.strip():
+            return [(self.pending_start, "unterminated quoted field")]
+        return []
+
+
+def validate_batch(records: list, key: str) -> tuple:
+    """Validate parsed records against schemas.book.Book.
+
+    Returns the upsert rows, deduplicated on the natural key (the last line
+    wins, a single upsert statement can't touch one row twice), and the
+    per-line errors.
+    """
+    rows = {}
+    errors = []
+    for line_no, record in records:
+        if isinstance(record, str):
+            errors.append({'line': line_no, 'error': record})
+            continue
+        try:
+            book = Book.model_validate(record)
+        except ValidationError as e:
+            errors.append({'line': line_no, 'error': "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors())})
+            continue
+        row = book.model_dump()
+        natural_key = tuple(row[column] for column in KEYS[key])
+        if None in natural_key:
+            errors.append({'line': line_no, 'error': f"{key} is required to import by {key}"})
+            continue
+        rows[natural_key] = (line_no, row)
+    return list(rows.values()), errors
+
+
+# dialects with INSERT ... ON CONFLICT DO UPDATE ... RETURNING; the rest upsert row by row
+ON_CONFLICT_INSERTS = {
+    "postgresql": postgresql.insert,
+    "sqlite": sqlite.insert,
+}
+
+
+def upsert_books_statement(dialect_name: str, rows: list, key: str):
+    """One multi-row INSERT ... ON CONFLICT over the natural key, returning (id, stock_shards, natural key) of each book."""
+    statement = ON_CONFLICT_INSERTS[dialect_name](Books).values(rows)
+    excluded = statement.excluded
+    updates = {field: excluded[field] for field in UPSERT_FIELDS if field not in KEYS[key]}
+    if 'sku' in updates:
+        # importing by title/author without a sku keeps the sku already on file
+        updates['sku'] = func.coalesce(excluded.sku, Books.sku)
+    # a sharded book's stock lives in its shards, upsert_books() splits the imported total over them
+    updates['stock_quantity'] = case((Books.stock_shards > 0, Books.stock_quantity), else_ = excluded.stock_quantity)
+    # updated_at only moves with admin edits, which set it themselves
+    updates['updated_at'] = utc_now()
+    return (statement.on_conflict_do_update(index_elements = KEYS[key], set_ = updates)
+            .returning(Books.id, Books.stock_shards, *[getattr(Books, column) for column in KEYS[key]]))
+
+
+def upsert_books_by_select(db, rows: list, key: str) -> list:
+    """Select-then-write upsert for dialects without ON CONFLICT ... RETURNING.
+
+    Existing books are looked up on the natural key in one query, then updated or
+    inserted one at a time. A concurrent insert of the same key surfaces as an
+    IntegrityError, same as with the single statement.
+    """
+    columns = [getattr(Books, column) for column in KEYS[key]]
+    natural_keys = [tuple(row[column] for column in KEYS[key]) for row in rows]
+    key_expr = tuple_(*columns) if len(columns) > 1 else columns[0]
+    wanted = natural_keys if len(columns) > 1 else [natural_key[0] for natural_key in natural_keys]
+    existing = {tuple(found[2:]): (found[0], found[1])
+                for found in db.execute(select(Books.id, Books.stock_shards, *columns).where(key_expr.in_(wanted)))}
+
+    books = []
+    for natural_key, row in zip(natural_keys, rows):
+        if natural_key not in existing:
+            books.append((db.execute(insert(Books).values(row)).inserted_primary_key[0], 0, natural_key))
+            continue
+        book_id, stock_shards = existing[natural_key]
+        updates = {field: row[field] for field in UPSERT_FIELDS if field not in KEYS[key]}
+        if 'sku' in updates and updates['sku'] is None:
+            del updates['sku']
+        if stock_shards:
+            del updates['stock_quantity']
+        updates['updated_at'] = utc_now()
+        db.execute(update(Books).where(Books.id == book_id).values(**updates).execution_options(synchronize_session = False))
+        books.append((book_id, stock_shards, natural_key))
+    return books
+
+
+def upsert_books(db, dialect_name: str, rows: list, key: str) -> list:
+    """Upsert rows on the natural key and return the book ids.
+
+    Sharded books keep their stock through the upsert; their shards are then
+    rebalanced to the imported total, the same way PUT and PATCH set it.
+    """
+    if dialect_name in ON_CONFLICT_INSERTS:
+        books = [(book[0], book[1], tuple(book[2:])) for book in db.execute(upsert_books_statement(dialect_name, rows, key))]
+    else:
+        books = upsert_books_by_select(db, rows, key)
+
+    stock = {tuple(row[column] for column in KEYS[key]): row['stock_quantity'] for row in rows}
+    for book_id, stock_shards, natural_key in books:
+        if stock_shards:
+            rebalance_shards(db, book_id, stock[natural_key])
+    return [book_id for book_id, _, _ in books]
+
+
+def empty_report() -> dict:
+    return {'rows': 0, 'upserted': 0, 'error_count': 0, 'errors': []}
+
+
+def add_errors(report: dict, errors: list):
+    report['error_count'] += len(errors)
+    room = MAX_REPORTED_ERRORS - len(report['errors'])
+    if room > 0:
+        report['errors'].extend(errors[:room])
+
+
+def upsert_batch(db, records: list, key: str, report: dict):
+    """Validate and upsert one batch of parsed records, then commit it."""
+    rows, errors = validate_batch(records, key)
+    report['rows'] += len(records)
+    dialect_name = db.get_bind().dialect.name
+    book_ids = []
+
+    if rows:
+        try:
+            with db.begin_nested():
+                book_ids = upsert_books(db, dialect_name, [row for _, row in rows], key)
+        except IntegrityError:
+            # a row clashed with the other natural key; redo the batch row by row
+            # so only the offending lines are rejected
+            for line_no, row in rows:
+                try:
+                    with db.begin_nested():
+                        book_ids.extend(upsert_books(db, dialect_name, [row], key))
+                except IntegrityError as e:
+                    errors.append({'line': line_no, 'error': f"conflicts with an existing book: {e.orig}"})
+
+    if book_ids:
+        bump_catalog_version(db)
+    db.commit()
+    if book_ids:
+        invalidate_catalog(*book_ids)
+    report['upserted'] += len(book_ids)
+    add_errors(report, sorted(errors, key = lambda error: error['line']))
+
+
+def import_lines(db, lines, import_format: str, key: str, batch_size: int = 1000) -> dict:
+    """Import an iterable of text lines (a file, a decoded stream), committing every batch_size records."""
+    parser = RowParser(import_format)
+    report = empty_report()
+    batch = []
+    for line in lines:
+        batch.extend(parser.feed(line))
+        if len(batch) >= batch_size:
+            upsert_batch(db, batch, key, report)
+            batch = []
+    batch.extend(parser.close())
+    if batch:
+        upsert_batch(db, batch, key, report)
+    return report
+
+
+async def stream_lines(chunks):
+    """Split an async stream of byte chunks (a request body) into text lines.
+
+    Lines end at "\n" only and a trailing "\r" is stripped, so a "\r\n" split
+    across two chunks stays one line and a bare "\r" or "\u2028" inside a
+    record stays part of it.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    pending = ""
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line.removesuffix("\r") + "\n"
+    pending += decoder.decode(b"", final = True)
+    if pending:
+        yield pending.removesuffix("\r")
@@ -0,0 +1,42 @@
+import hashlib
+import json
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from fastapi import Request
+
+
+def make_etag(*parts, weak: bool = False) -> str:
+    digest = hashlib.blake2b(json.dumps(parts, default = str, sort_keys = True).encode(), digest_size = 12).hexdigest()
+    return f'W/"{digest}"' if weak else f'"{digest}"'
+
+
+def as_utc(value: datetime) -> datetime:
+    # sqlite hands back naive UTC timestamps
+    return value.replace(tzinfo = timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
+
+def validator_headers(etag: str, last_modified: datetime | None) -> dict:
+    # no-cache: clients may keep the body but must revalidate it on every use
+    headers = {'ETag': etag, 'Cache-Control': 'no-cache'}
+    if last_modified is not None:
+        headers['Last-Modified'] = format_datetime(as_utc(last_modified), usegmt = True)
+    return headers
+
+
+def is_not_modified(request: Request, etag: str, last_modified: datetime | None) -> bool:
+    """Evaluate If-None-Match (weak comparison), or If-Modified-Since when no ETag was sent."""
+    if_none_match = request.headers.get('if-none-match')
+    if if_none_match is not None:
+        if if_none_match.strip() == '*':
+            return True
+        tags = {tag.strip().removeprefix('W/') for tag in if_none_match.split(',')}
+        return etag.removeprefix('W/') in tags
+
+    if_modified_since = request.headers.get('if-modified-since')
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        return as_utc(last_modified).replace(microsecond = 0) <= as_utc(since)
+    return False
@@ -0,0 +1,208 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone, timedelta
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestRegressor
+
+
+LAGS = (1, 2, 4, 8)
+ROLLING_WINDOWS = (4, 8)
+FEATURES = [f"lag_{lag}" for lag in LAGS] + [f"rolling_mean_{window}" for window in ROLLING_WINDOWS] + ["week_of_year"]
+MIN_HISTORY = max(max(LAGS), max(ROLLING_WINDOWS))
+
+MODEL_PARAMS = {'n_estimators': 200, 'min_samples_leaf': 2, 'random_state': 42}
+
+MODEL_DIR = os.getenv("FORECAST_MODEL_DIR",
+                      os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "ml", "models"))
+
+
+class ForecastUnavailable(Exception):
+    pass
+
+
+
+# --- features -----------------------------------------------------------------
+
+def weekly_matrix(demand: pd.DataFrame, data_end = None) -> pd.DataFrame:
+    """Weeks x domains matrix of quantities from rollup rows (domain, period_start, quantity).
+
+    Missing weeks inside a domain's history, and after its last sale up to data_end
+    (the latest week of the whole rollup), become 0; weeks before its first sale stay NaN.
+    """
+    if demand.empty:
+        raise ForecastUnavailable("No sales history in the demand rollup")
+    wide = demand.pivot_table(index = "period_start", columns = "domain", values = "quantity", aggfunc = "sum")
+    wide.index = pd.to_datetime(wide.index)
+    end = wide.index.max() if data_end is None else max(wide.index.max(), pd.Timestamp(data_end))
+    weeks = pd.date_range(wide.index.min(), end, freq = "W-MON")
+    wide = wide.reindex(weeks)
+
+    first_seen = wide.notna().idxmax()
+    started = wide.index.values[:, None] >= first_seen.values[None, :]
+    return wide.fillna(0).where(started)
+
+
+def build_features(wide: pd.DataFrame) -> pd.DataFrame:
+    """Lag and rolling-mean features for every domain at once.
+
+    Each shift/rolling call runs over the whole weeks x domains matrix, so the cost
+    does not grow with a python loop over domains. Returns a (week, domain) indexed
+    frame with FEATURES and the target column.
+    """
+    shifted = wide.shift(1)
+    frames = {f"lag_{lag}": wide.shift(lag) for lag in LAGS}
+    frames.update({f"rolling_mean_{window}": shifted.rolling(window).mean() for window in ROLLING_WINDOWS})
+    frames["target"] = wide
+
+    features = pd.concat({name: frame.stack() for name, frame in frames.items()}, axis = 1)
+    features.index.names = ["week", "domain"]
+    features["week_of_year"] = pd.DatetimeIndex(features.index.get_level_values("week")).isocalendar().week.to_numpy()
+    return features.dropna()
+
+
+def feature_row(history: np.ndarray, week: pd.Timestamp) -> list:
+    """Features for the week following `history`, matching build_features()."""
+    row = [history[-lag] for lag in LAGS]
+    row += [history[-window:].mean() for window in ROLLING_WINDOWS]
+    row.append(week.isocalendar()[1])
+    return row
+
+
+
+# --- training -----------------------------------------------------------------
+
+def fit_domain(domain: str, X: np.ndarray, y: np.ndarray, params: dict):
+    """Runs in a worker process."""
+    start = time.perf_counter()
+    model = RandomForestRegressor(n_jobs = 1, **params)
+    model.fit(X, y)
+    return domain, model, len(y), time.perf_counter() - start
+
+
+def train_models(demand: pd.DataFrame, workers: int | None = None, params: dict = MODEL_PARAMS):
+    """Train one model per domain in a process pool. Returns ({domain: model}, stats)."""
+    start = time.perf_counter()
+    features = build_features(weekly_matrix(demand))
+    feature_seconds = time.perf_counter() - start
+
+    jobs = [(domain, group[FEATURES].to_numpy(), group["target"].to_numpy())
+            for domain, group in features.groupby(level = "domain")]
+    jobs = [job for job in jobs if len(job[2]) >= MIN_HISTORY]
+
+    models = {}
+    rows = {}
+    with ProcessPoolExecutor(max_workers = workers) as pool:
+        futures = [pool.submit(fit_domain, domain, X, y, params) for domain, X, y in jobs]
+        for future in futures:
+            domain, model, n_rows, _ = future.result()
+            models[domain] = model
+            rows[domain] = n_rows
+
+    stats = {
+        'domains': len(models),
+        'rows': int(sum(rows.values())),
+        'feature_seconds': round(feature_seconds, 3),
+        'total_seconds': round(time.perf_counter() - start, 3),
+        'data_end': str(features.index.get_level_values("week").max().date()) if len(features) else None,
+    }
+    return models, stats
+
+
+
+# --- versioned model store ----------------------------------------------------
+
+def model_filename(domain: str) -> str:
+    slug = "".join(ch if ch.isalnum() else "_" for ch in domain.lower())[:40]
+    return f"{slug}-{hashlib.sha1(domain.encode()).hexdigest()[:8]}.joblib"
+
+
+def save_models(models: dict, stats: dict, model_dir: str = MODEL_DIR) -> str:
+    """Write the models under a new version directory and point LATEST at it."""
+    version = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%f")
+    version_dir = os.path.join(model_dir, version)
+    os.makedirs(version_dir)
+
+    files = {}
+    for domain, model in models.items():
+        files[domain] = model_filename(domain)
+        joblib.dump(model, os.path.join(version_dir, files[domain]))
+
+    manifest = {'version': version, 'features': FEATURES, 'params': MODEL_PARAMS, 'models': files, **stats}
+    with open(os.path.join(version_dir, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent = 2)
+
+    latest_tmp = os.path.join(model_dir, "LATEST.tmp")
+    with open(latest_tmp, "w") as f:
+        f.write(version)
+    os.replace(latest_tmp, os.path.join(model_dir, "LATEST"))
+    return version
+
+
+_loaded = {}
+_loaded_lock = threading.Lock()
+
+
+def latest_manifest(model_dir: str = MODEL_DIR) -> dict:
+    try:
+        with open(os.path.join(model_dir, "LATEST")) as f:
+            version = f.read().strip()
+        with open(os.path.join(model_dir, version, "manifest.json")) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        raise ForecastUnavailable("No trained forecast model, run scripts/train_forecast.py")
+
+
+def load_model(domain: str, model_dir: str = MODEL_DIR):
+    """Latest model for a domain, kept in memory per version."""
+    manifest = latest_manifest(model_dir)
+    if domain not in manifest['models']:
+        raise ForecastUnavailable(f"No forecast model for domain {domain!r}")
+
+    key = (manifest['version'], domain)
+    with _loaded_lock:
+        if key not in _loaded:
+            # a newer version was trained since, drop the old models
+            for old_key in [old_key for old_key in _loaded if old_key[0] != manifest['version']]:
+                del _loaded[old_key]
+            _loaded[key] = joblib.load(os.path.join(model_dir, manifest['version'], manifest['models'][domain]))
+        return manifest['version'], _loaded[key]
+
+
+
+# --- forecasting --------------------------------------------------------------
+
+def forecast(domain: str, demand: pd.DataFrame, weeks: int, data_end = None) -> dict:
+    """Recursive multi-week forecast: each predicted week feeds the next one's lags.
+
+    `demand` may hold the domain's rows only; pass the latest week of the whole rollup
+    as data_end so weeks without sales at the end of its history count as zeros, the
+    way training saw them, and the forecast starts after that week.
+    """
+    version, model = load_model(domain)
+
+    if demand.empty:
+        raise ForecastUnavailable(f"No sales history for domain {domain!r}")
+    wide = weekly_matrix(demand, data_end)
+    if domain not in wide.columns:
+        raise ForecastUnavailable(f"No sales history for domain {domain!r}")
+    series = wide[domain].dropna()
+    if len(series) < MIN_HISTORY:
+        raise ForecastUnavailable(f"Need at least {MIN_HISTORY} weeks of history for domain {domain!r}")
+
+    history = series.to_numpy(dtype = float)
+    week = series.index[-1]
+    predictions = []
+    for _ in range(weeks):
+        week = week + timedelta(weeks = 1)
+        quantity = max(0.0, float(model.predict(np.array([feature_row(history, week)]))[0]))
+        history = np.append(history, quantity)
+        predictions.append({'week_start': week.date(), 'quantity': round(quantity, 2)})
+
+    return {'domain': domain, 'model_version': version, 'last_observed_week': series.index[-1].date(), 'forecast': predictions}
@@ -0,0 +1,42 @@
+#Gemini + LangChain query parser, only imported when AI search first needs it
+from langchain_core.prompts import PromptTemplate
+from langchain_core.output_parsers import PydanticOutputParser
+from langchain_google_genai import ChatGoogleGenerativeAI
+from dotenv import load_dotenv
+from services.ai_search import AISearch
+
+load_dotenv()
+
+
+parser = PydanticOutputParser(pydantic_object = AISearch)
+
+template = PromptTemplate(
+    template = """
+You are an assistant that extracts structured filters from a user's natural language query
+for a book inventory and order system.
+
+User query:
+"{query}"
+
+Your task:
+- Extract relevant filters from the query.
+- If a field is not mentioned, return null.
+- Do NOT invent values.
+- Return ONLY valid JSON.
+- The JSON must strictly follow the schema below.
+
+{format_instructions}
+
+""",
+    input_variables=['query'],
+    partial_variables = {'format_instructions':parser.get_format_instructions()}
+)
+
+
+def build_chain(llm):
+    return template | llm | parser
+
+
+def create_provider():
+    model = ChatGoogleGenerativeAI(model="gemini-3-flash-preview", response_mime_type="application/json", temperature = 0)
+    return build_chain(model)
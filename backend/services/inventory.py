@@ -0,0 +1,235 @@
+import os
+import random
+import threading
+import time
+from fastapi import HTTPException
+from starlette import status
+from sqlalchemy import update, select, delete, insert, func
+from models import Books, StockShard
+from database import Session_local
+from services.catalog import invalidate_book
+
+
+# how often the shard totals of sharded books that took orders are written back
+# to books.stock_quantity, the figure every catalog read shows
+SHARD_SYNC_SECONDS = max(float(os.getenv("STOCK_SHARD_SYNC_SECONDS", 1.0)), 0.05)
+
+MAX_SHARDS = 64
+
+_dirty_books = set()
+_dirty_lock = threading.Lock()
+_syncer = None
+
+
+def reserve_stock(db, book_id: int, quantity: int):
+    """Atomically take `quantity` units of a book out of stock and return its current price."""
+    price = take_stock(db, book_id, quantity)
+    if price is None:
+        raise HTTPException(status_code = status.HTTP_422_UNPROCESSABLE_CONTENT, detail = "Insufficient stock.")
+    return price
+
+
+def take_stock(db, book_id: int, quantity: int):
+    """Take `quantity` units of a book out of stock; returns its price, or None when it is short.
+
+    The check and the decrement happen in a single conditional UPDATE, so concurrent
+    orders can never push stock below zero and no ORM instance has to be loaded.
+    Books in hot-SKU mode take the stock from one of their shards instead.
+    """
+    stmt = (
+        update(Books)
+        .where(Books.id == book_id, Books.stock_shards == 0, Books.stock_quantity >= quantity)
+        .values(stock_quantity = Books.stock_quantity - quantity)
+        .returning(Books.price)
+        .execution_options(synchronize_session = False)
+    )
+    price = db.execute(stmt).scalar_one_or_none()
+
+    if price is None:
+        # the update matched nothing: the book is missing, sharded, or short of stock
+        book = db.execute(select(Books.price, Books.stock_shards).where(Books.id == book_id)).first()
+        if book is None:
+            raise HTTPException(status_code = status.HTTP_404_NOT_FOUND, detail = "Book not found.")
+        if not book.stock_shards or not reserve_from_shards(db, book_id, quantity, book.stock_shards):
+            return None
+        mark_stock_dirty(book_id)
+        price = book.price
+
+    return price
+
+
+def reserve_from_shards(db, book_id: int, quantity: int, shards: int) -> bool:
+    """Take stock from one shard, starting at a random one so concurrent orders spread out.
+
+    Only when no single shard can cover the order are all shards locked and
+    drained together.
+    """
+    start = random.randrange(shards)
+    for shard in [(start + offset) % shards for offset in range(shards)]:
+        stmt = (
+            update(StockShard)
+            .where(StockShard.book_id == book_id, StockShard.shard == shard, StockShard.quantity >= quantity)
+            .values(quantity = StockShard.quantity - quantity)
+            .execution_options(synchronize_session = False)
+        )
+        if db.execute(stmt).rowcount:
+            return True
+
+    rows = db.execute(select(StockShard.shard, StockShard.quantity)
+                      .where(StockShard.book_id == book_id)
+                      .order_by(StockShard.shard)
+                      .with_for_update()).all()
+    if sum(row.quantity for row in rows) < quantity:
+        return False
+    remaining = quantity
+    for row in rows:
+        take = min(row.quantity, remaining)
+        if take:
+            db.execute(update(StockShard)
+                       .where(StockShard.book_id == book_id, StockShard.shard == row.shard)
+                       .values(quantity = StockShard.quantity - take)
+                       .execution_options(synchronize_session = False))
+            remaining -= take
+        if not remaining:
+            break
+    return True
+
+
+def shard_release_statement(book_id: int, quantity: int, shards: int):
+    """Returns stock to a random shard of a sharded book."""
+    return (
+        update(StockShard)
+        .where(StockShard.book_id == book_id, StockShard.shard == random.randrange(shards))
+        .values(quantity = StockShard.quantity + quantity)
+        .execution_options(synchronize_session = False)
+    )
+
+
+def stock_release_statement(book_id: int, quantity: int):
+    """Returns stock to an unsharded book in place, without a read-modify-write."""
+    return (
+        update(Books)
+        .where(Books.id == book_id)
+        .values(stock_quantity = Books.stock_quantity + quantity)
+        .execution_options(synchronize_session = False)
+    )
+
+
+def release_stock(db, book_id: int, quantity: int):
+    """Put `quantity` units of a book back into stock without loading the row."""
+    shards = db.execute(select(Books.stock_shards).where(Books.id == book_id)).scalar_one_or_none()
+    if shards:
+        return db.execute(shard_release_statement(book_id, quantity, shards)).rowcount
+    return db.execute(stock_release_statement(book_id, quantity)).rowcount
+
+
+def stock_total_statement(book_id: int):
+    total = select(func.coalesce(func.sum(StockShard.quantity), 0)).where(StockShard.book_id == book_id).scalar_subquery()
+    return (
+        update(Books)
+        .where(Books.id == book_id)
+        .values(stock_quantity = total)
+        .execution_options(synchronize_session = False)
+    )
+
+
+def sync_stock_totals(db, book_ids):
+    """Refresh books.stock_quantity of sharded books from their shards."""
+    for book_id in sorted(book_ids):
+        db.execute(stock_total_statement(book_id))
+
+
+def mark_stock_dirty(*book_ids: int):
+    """Queue sharded books whose shards changed for the next background total sync.
+
+    The total is never written inside the transaction that changed a shard:
+    that would lock shards before books, the reverse of the batch order and
+    admin paths, which lock books first, and the two would deadlock.
+    """
+    global _syncer
+    with _dirty_lock:
+        _dirty_books.update(book_ids)
+        if _syncer is None:
+            _syncer = threading.Thread(target = _sync_loop, name = "stock-shard-sync", daemon = True)
+            _syncer.start()
+
+
+def _sync_loop():
+    # books are marked before the order that changed them commits, so each one is
+    # synced again on the following round to pick up a late commit
+    previous = set()
+    while True:
+        time.sleep(SHARD_SYNC_SECONDS)
+        with _dirty_lock:
+            marked = set(_dirty_books)
+            _dirty_books.clear()
+        book_ids, previous = marked | previous, marked
+        if not book_ids:
+            continue
+        # a short transaction of its own: it locks books rows and only reads shards
+        db = Session_local()
+        try:
+            sync_stock_totals(db, book_ids)
+            db.commit()
+            invalidate_book(*book_ids)
+        except Exception:
+            db.rollback()
+            with _dirty_lock:
+                _dirty_books.update(book_ids)
+        finally:
+            db.close()
+
+
+def split_stock(total: int, shards: int) -> list:
+    return [total // shards + (1 if shard < total % shards else 0) for shard in range(shards)]
+
+
+def lock_book(db, book_id: int) -> Books:
+    book = db.query(Books).filter(Books.id == book_id).with_for_update().first()
+    if not book:
+        raise HTTPException(status_code = status.HTTP_404_NOT_FOUND, detail = "Book not found.")
+    return book
+
+
+def locked_shard_total(db, book_id: int) -> int:
+    rows = db.execute(select(StockShard.quantity)
+                      .where(StockShard.book_id == book_id)
+                      .order_by(StockShard.shard)
+                      .with_for_update()).scalars().all()
+    return sum(rows)
+
+
+def reshard(db, book: Books, shards: int, total: int):
+    db.execute(delete(StockShard).where(StockShard.book_id == book.id))
+    db.execute(insert(StockShard), [{'book_id': book.id, 'shard': shard, 'quantity': quantity}
+                                    for shard, quantity in enumerate(split_stock(total, shards))])
+    book.stock_shards = shards
+    book.stock_quantity = total
+
+
+def enable_shards(db, book_id: int, shards: int) -> Books:
+    """Split a book's stock evenly over `shards` counters; re-splits an already sharded book."""
+    book = lock_book(db, book_id)
+    total = locked_shard_total(db, book_id) if book.stock_shards else book.stock_quantity
+    reshard(db, book, shards, total)
+    return book
+
+
+def rebalance_shards(db, book_id: int, total: int | None = None) -> Books:
+    """Even out a sharded book's shards, optionally setting a new stock total."""
+    book = lock_book(db, book_id)
+    if not book.stock_shards:
+        raise HTTPException(status_code = status.HTTP_409_CONFLICT, detail = "Book stock is not sharded.")
+    current = locked_shard_total(db, book_id)
+    reshard(db, book, book.stock_shards, current if total is None else total)
+    return book
+
+
+def collapse_shards(db, book_id: int) -> Books:
+    """Fold a book's shards back into books.stock_quantity."""
+    book = lock_book(db, book_id)
+    if book.stock_shards:
+        book.stock_quantity = locked_shard_total(db, book_id)
+        db.execute(delete(StockShard).where(StockShard.book_id == book_id))
+        book.stock_shards = 0
+    return book
@@ -0,0 +1,58 @@
+from sqlalchemy import select, insert, func, cast, tuple_, BigInteger, Text
+from models import OrderEvent
+
+
+CREATED = "CREATED"
+STATUS_CHANGED = "STATUS_CHANGED"
+
+# id of the writing transaction (postgres xid8, which fits a bigint)
+CURRENT_TXID = cast(cast(func.pg_current_xact_id(), Text), BigInteger)
+
+# every transaction with a lower id has committed or rolled back
+VISIBLE_TXID_HORIZON = cast(cast(func.pg_snapshot_xmin(func.pg_current_snapshot()), Text), BigInteger)
+
+
+def order_event(order, event_type: str, to_status: str, from_status: str | None = None, actor_id: int | None = None) -> dict:
+    return {'order_id': order.id,
+            'event_type': event_type,
+            'from_status': from_status,
+            'to_status': to_status,
+            'user_id': order.user_id,
+            'book_id': order.book_id,
+            'quantity': order.quantity,
+            'actor_id': actor_id}
+
+
+def append_event_statements(dialect_name: str, events: list) -> list:
+    """Statements appending events inside the caller's transaction, without any lock.
+
+    Postgres tags each event with the id of the transaction writing it, which
+    events_query() uses to hold back events that may still be joined by others.
+    SQLite serializes writers, so there seq order is already commit order.
+    """
+    if not events:
+        return []
+    if dialect_name == "postgresql":
+        events = [{**event, 'txid': CURRENT_TXID} for event in events]
+    return [insert(OrderEvent).values(events)]
+
+
+def events_query(dialect_name: str, after: int, limit: int, order_id: int | None = None):
+    """Events following the one numbered `after`, in (txid, seq) order.
+
+    Postgres hands out seq at insert time, so a transaction still in flight can
+    commit an event numbered below ones already read. Events are read in
+    transaction id order instead, and only from transactions below the
+    snapshot's xmin: those have all finished, so no later commit can land
+    before a position a reader has passed. `after` stays the seq of the last
+    event read; its (txid, seq) is looked up by primary key.
+    """
+    query = select(OrderEvent)
+    if after:
+        after_txid = func.coalesce(select(OrderEvent.txid).where(OrderEvent.seq == after).scalar_subquery(), 0)
+        query = query.where(tuple_(OrderEvent.txid, OrderEvent.seq) > tuple_(after_txid, after))
+    if dialect_name == "postgresql":
+        query = query.where(OrderEvent.txid < VISIBLE_TXID_HORIZON)
+    if order_id is not None:
+        query = query.where(OrderEvent.order_id == order_id)
+    return query.order_by(OrderEvent.txid, OrderEvent.seq).limit(limit)
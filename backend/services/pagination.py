@@ -0,0 +1,91 @@
+import base64
+import json
+from collections.abc import Mapping
+from datetime import datetime
+from fastapi import HTTPException
+from starlette import status
+from sqlalchemy import tuple_, func, literal, DateTime
+
+
+def encode_cursor(sort_by: str, order: str, value, row_id: int) -> str:
+    """Pack the sort key and id of the last row on a page into an opaque url-safe token."""
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    payload = json.dumps({'s': sort_by, 'o': order, 'v': value, 'id': row_id}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str, sort_by: str, order: str):
+    """Return the (value, id) stored in a cursor, rejecting tokens issued for a different sort."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        value, row_id = payload['v'], int(payload['id'])
+        sort_matches = payload.get('s') == sort_by and payload.get('o') == order
+        if sort_matches and sort_by == 'created_at':
+            value = datetime.fromisoformat(value)
+    except (ValueError, KeyError, TypeError, AttributeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor.")
+
+    if not sort_matches:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cursor does not match the requested sort_by/order.")
+    return value, row_id
+
+
+# sqlite keeps timestamps as text, and server_default now() rows ('2026-10-18 13:17:09')
+# don't compare as strings against bound datetimes ('2026-10-18 13:17:09.000000');
+# normalizing both sides to one format keeps the comparison chronological
+SQLITE_TIMESTAMP = '%Y-%m-%d %H:%M:%f'
+
+
+def comparable(column, value, dialect_name: str | None):
+    """The sort key expression and cursor value to compare it with."""
+    if dialect_name == 'sqlite' and isinstance(column.type, DateTime):
+        normalized = func.strftime(SQLITE_TIMESTAMP, column)
+        if value is not None:
+            value = func.strftime(SQLITE_TIMESTAMP, literal(value, column.type))
+        return normalized, value
+    return column, value
+
+
+def apply_keyset(query, sort_column, id_column, order: str, page_size: int, cursor: str | None, sort_by: str,
+                 dialect_name: str | None = None):
+    """Filter, order and limit an ORM Query or a select() to the page after `cursor`.
+
+    The id is the tie-breaker and is sorted in the same direction as the sort column,
+    so every page is a single index range scan regardless of how deep the client is.
+    One extra row is fetched so next_page() can tell whether another page exists.
+    Pass the dialect name so timestamp keys compare correctly on sqlite.
+    """
+    sort_key, _ = comparable(sort_column, None, dialect_name)
+
+    if cursor:
+        last_value, last_id = decode_cursor(cursor, sort_by, order)
+        _, last_value = comparable(sort_column, last_value, dialect_name)
+        key, last = tuple_(sort_key, id_column), tuple_(last_value, last_id)
+        query = query.filter(key < last if order == 'desc' else key > last)
+
+    if order == 'desc':
+        query = query.order_by(sort_key.desc(), id_column.desc())
+    else:
+        query = query.order_by(sort_key.asc(), id_column.asc())
+
+    return query.limit(page_size + 1)
+
+
+def next_page(rows, sort_column, id_column, order: str, page_size: int, sort_by: str):
+    """Trim the extra row fetched by apply_keyset() and return (rows, next_cursor).
+
+    Rows may be ORM objects or mappings (dicts) from a column-projected select().
+    """
+    rows = list(rows)
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        last = rows[-1]
+        if isinstance(last, Mapping):
+            value, row_id = last[sort_column.key], last[id_column.key]
+        else:
+            value, row_id = getattr(last, sort_column.key), getattr(last, id_column.key)
+        next_cursor = encode_cursor(sort_by, order, value, row_id)
+    return rows, next_cursor
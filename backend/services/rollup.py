@@ -0,0 +1,121 @@
+from collections import defaultdict
+from datetime import date, timedelta
+from sqlalchemy import select, insert, func
+from sqlalchemy.dialects import postgresql, sqlite
+from models import DemandRollup, HistoricalSales, Sales
+
+
+GRAINS = ("day", "week")
+
+# rollup rows that aggregate every book of a domain use this book_id
+ALL_BOOKS = 0
+
+
+def period_start(grain: str, day: date) -> date:
+    if grain == "week":
+        return day - timedelta(days = day.weekday())
+    return day
+
+
+def rollup_rows(domain: str, book_id: int | None, sale_date: date, quantity: int, revenue: int) -> list:
+    """Rollup rows touched by one sale: day and ISO week, per domain and (when known) per book."""
+    book_ids = [ALL_BOOKS] if book_id is None else [ALL_BOOKS, book_id]
+    return [{'grain': grain, 'period_start': period_start(grain, sale_date), 'domain': domain,
+             'book_id': key, 'quantity': quantity, 'revenue': revenue}
+            for grain in GRAINS for key in book_ids]
+
+
+def merge_rollup_rows(rows: list) -> list:
+    """Sum rows sharing a bucket; one upsert statement may not touch the same bucket twice."""
+    merged = {}
+    for row in rows:
+        key = (row['grain'], row['domain'], row['book_id'], row['period_start'])
+        if key in merged:
+            merged[key]['quantity'] += row['quantity']
+            merged[key]['revenue'] += row['revenue']
+        else:
+            merged[key] = dict(row)
+    return list(merged.values())
+
+
+def upsert_rollups(dialect_name: str, rows: list):
+    """INSERT ... ON CONFLICT that adds the rows' quantity and revenue onto existing buckets."""
+    if dialect_name == "postgresql":
+        stmt = postgresql.insert(DemandRollup).values(rows)
+    elif dialect_name == "sqlite":
+        stmt = sqlite.insert(DemandRollup).values(rows)
+    else:
+        raise NotImplementedError(f"demand rollups are not supported on {dialect_name}")
+
+    return stmt.on_conflict_do_update(
+        index_elements = ['grain', 'domain', 'book_id', 'period_start'],
+        set_ = {'quantity': DemandRollup.quantity + stmt.excluded.quantity,
+                'revenue': DemandRollup.revenue + stmt.excluded.revenue})
+
+
+def sale_rollup_statement(dialect_name: str, sale: Sales):
+    """Statement recording a freshly created Sales row in the rollup, run in the same transaction."""
+    return upsert_rollups(dialect_name, rollup_rows(sale.domain, sale.book_id, sale.sale_date,
+                                                   sale.quantity, sale.quantity * sale.price_at_sale))
+
+
+def sales_rollup_statement(dialect_name: str, sales: list):
+    """Like sale_rollup_statement() for many Sales rows (given as dicts) in one statement."""
+    rows = [row for sale in sales
+            for row in rollup_rows(sale['domain'], sale['book_id'], sale['sale_date'],
+                                   sale['quantity'], sale['quantity'] * sale['price_at_sale'])]
+    return upsert_rollups(dialect_name, merge_rollup_rows(rows))
+
+
+def rebuild_rollups(db, batch_size: int = 5000) -> int:
+    """Recompute the whole rollup from historical_sales and sales.
+
+    Both fact tables are first grouped by day in the database; weeks are derived
+    from those daily totals, so only the compact daily result is read into memory.
+    """
+    buckets = defaultdict(lambda: [0, 0])
+
+    def add(domain, book_id, sale_date, quantity, revenue):
+        for row in rollup_rows(domain, book_id, sale_date, quantity, revenue):
+            bucket = buckets[(row['grain'], row['domain'], row['book_id'], row['period_start'])]
+            bucket[0] += row['quantity']
+            bucket[1] += row['revenue']
+
+    historical = db.execute(select(HistoricalSales.domain, HistoricalSales.sale_date, func.sum(HistoricalSales.quantity))
+                            .group_by(HistoricalSales.domain, HistoricalSales.sale_date))
+    for domain, sale_date, quantity in historical:
+        add(domain, None, sale_date, int(quantity), 0)
+
+    sales = db.execute(select(Sales.domain, Sales.book_id, Sales.sale_date, func.sum(Sales.quantity),
+                              func.sum(Sales.quantity * Sales.price_at_sale))
+                       .group_by(Sales.domain, Sales.book_id, Sales.sale_date))
+    for domain, book_id, sale_date, quantity, revenue in sales:
+        add(domain, book_id, sale_date, int(quantity), int(revenue))
+
+    db.query(DemandRollup).delete(synchronize_session = False)
+    rows = [{'grain': grain, 'domain': domain, 'book_id': book_id, 'period_start': start,
+             'quantity': quantity, 'revenue': revenue}
+            for (grain, domain, book_id, start), (quantity, revenue) in buckets.items()]
+    for i in range(0, len(rows), batch_size):
+        db.execute(insert(DemandRollup), rows[i:i + batch_size])
+    return len(rows)
+
+
+def demand_query(grain: str = "week", domain: str | None = None, book_id: int | None = None,
+                 start: date | None = None, end: date | None = None):
+    """Select demand buckets from the rollup, oldest first."""
+    query = select(DemandRollup.domain, DemandRollup.book_id, DemandRollup.period_start,
+                   DemandRollup.quantity, DemandRollup.revenue).where(
+        DemandRollup.grain == grain, DemandRollup.book_id == (book_id or ALL_BOOKS))
+    if domain:
+        query = query.where(DemandRollup.domain == domain)
+    if start:
+        query = query.where(DemandRollup.period_start >= period_start(grain, start))
+    if end:
+        query = query.where(DemandRollup.period_start <= end)
+    return query.order_by(DemandRollup.domain, DemandRollup.period_start)
+
+
+def latest_period_query(grain: str = "week"):
+    """Start of the latest period with any sale, across all domains."""
+    return select(func.max(DemandRollup.period_start)).where(DemandRollup.grain == grain, DemandRollup.book_id == ALL_BOOKS)
@@ -0,0 +1,56 @@
+import os
+import re
+from sqlalchemy import func, or_, select, text, literal_column
+from models import Books
+from services.catalog import book_rows, fetch_books
+
+
+# stored generated tsvector over title, author and domain (postgres only, GIN indexed),
+# not mapped on Books so sqlite dev databases built from the models don't need it
+SEARCH_VECTOR = literal_column("books.search_tsv")
+
+# ranked results can be paged this deep: every match is ranked, but the database only
+# keeps the best offset + limit of them in its top-N sort. Deeper pages are refused
+MAX_SEARCH_RESULTS = int(os.getenv("SEARCH_MAX_RESULTS", "1000"))
+
+
+def fts5_query(query: str) -> str:
+    """Turn free text into an FTS5 query: every word quoted and prefix-matched, all required."""
+    terms = re.findall(r"\w+", query)
+    return " ".join(f'"{term}"*' for term in terms)
+
+
+def ilike_search(db, query: str, limit: int, offset: int):
+    pattern = f"%{query.strip()}%"
+    return fetch_books(db, book_rows()
+                       .where(or_(Books.title.ilike(pattern), Books.author.ilike(pattern), Books.domain.ilike(pattern)))
+                       .order_by(Books.id)
+                       .limit(limit).offset(offset))
+
+
+def ranked_search(db, query: str, limit: int = 20, offset: int = 0):
+    """Full-text search over title, author and domain, best matches first.
+
+    Uses the stored tsvector and its GIN index on Postgres and the books_fts FTS5
+    table on SQLite, falling back to a plain ILIKE scan when neither is available.
+    Callers keep offset + limit within MAX_SEARCH_RESULTS. Returns plain dicts.
+    """
+    dialect = db.get_bind().dialect.name
+
+    if dialect == "postgresql":
+        tsquery = func.websearch_to_tsquery('simple', query)
+        return fetch_books(db, book_rows()
+                           .where(SEARCH_VECTOR.op('@@')(tsquery))
+                           .order_by(func.ts_rank(SEARCH_VECTOR, tsquery).desc(), Books.id)
+                           .limit(limit).offset(offset))
+
+    if dialect == "sqlite" and db.execute(text("SELECT 1 FROM sqlite_master WHERE name = 'books_fts'")).first():
+        match = fts5_query(query)
+        if not match:
+            return []
+        ids = db.execute(text("SELECT rowid FROM books_fts WHERE books_fts MATCH :match ORDER BY rank, rowid LIMIT :limit OFFSET :offset"),
+                         {'match': match, 'limit': limit, 'offset': offset}).scalars().all()
+        books = {book['id']: book for book in fetch_books(db, book_rows().where(Books.id.in_(ids)))}
+        return [books[book_id] for book_id in ids if book_id in books]
+
+    return ilike_search(db, query, limit, offset)
@@ -120,7 +120,16 @@ if st.button("Search with AI"):
 st.divider()
 st.subheader("📚 Browse All Books")
 
-res = requests.get(f"{BASE_URL}/public/")
+# revalidate the cached catalog page instead of downloading it again on every rerun
+catalog_cache = st.session_state.get("catalog_cache")
+res = requests.get(
+    f"{BASE_URL}/public/",
+    headers={"If-None-Match": catalog_cache["etag"]} if catalog_cache else {}
+)
+if res.status_code == 304:
+    res = catalog_cache["response"]
+elif res.status_code == 200 and res.headers.get("ETag"):
+    st.session_state["catalog_cache"] = {"etag": res.headers["ETag"], "response": res}
 if res.status_code == 200:
     data = res.json()
 
@@ -205,7 +214,7 @@ with tab_objs[2]:
     )
 
     if res.status_code == 200:
-        orders = res.json()
+        orders = res.json()["items"]
         if orders:
             st.dataframe(orders, use_container_width=True, hide_index=True)
         else: